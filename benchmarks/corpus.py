@@ -0,0 +1,97 @@
+# ================================
+# Synthetische Korpora für Benchmarks
+#
+# Erzeugt Code-Dateien und PDFs in festen Größen. Die PDFs werden direkt
+# als Bytes geschrieben (ein Text-Stream pro Seite), damit kein zusätzliches
+# Paket nötig ist; PyPDF2 extrahiert den Text wie bei echten Dokumenten.
+# Gleicher seed → byte-identische Dateien.
+# ================================
+
+import random
+from pathlib import Path
+
+_WORDS = (
+    "index embedding vektor chunk modell anfrage antwort kontext datei seite "
+    "suche treffer cache latenz durchsatz speicher thread prozess netzwerk "
+    "repository commit issue server client protokoll parser tabelle schema"
+).split()
+
+
+def random_sentence(rng, n_words=12):
+    """Zufälliger Satz aus einem festen Wortschatz (deterministisch über rng)."""
+    words = [rng.choice(_WORDS) for _ in range(n_words)]
+    return " ".join(words).capitalize() + "."
+
+
+def make_code_corpus(folder, n_files: int, functions_per_file: int = 20, seed: int = 0):
+    """Schreibt n_files Python-Dateien mit Funktionen und Kommentaren. Liefert die Pfade."""
+    rng = random.Random(seed)
+    folder = Path(folder)
+    folder.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for f in range(n_files):
+        lines = [f'"""Modul {f}: {random_sentence(rng)}"""', "", "import os", ""]
+        for i in range(functions_per_file):
+            lines += [
+                f"def func_{f}_{i}(value, limit={rng.randint(1, 100)}):",
+                f"    # {random_sentence(rng)}",
+                f"    result = [x * {i} for x in range(limit) if x % {rng.randint(2, 9)}]",
+                "    if value > limit:",
+                f"        return sum(result) + value  # {rng.choice(_WORDS)}",
+                "    return len(result)",
+                "",
+            ]
+        path = folder / f"modul_{f}.py"
+        path.write_text("\n".join(lines), encoding="utf-8")
+        paths.append(path)
+    return paths
+
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def pdf_bytes(pages) -> bytes:
+    """Minimales PDF mit einer Seite pro Eintrag in pages (Liste von Zeilenlisten)."""
+    n = len(pages)
+    # Objekte: 1 Catalog, 2 Pages, 3 Font, dann je Seite (Page, Content)
+    kids = " ".join(f"{4 + 2 * i} 0 R" for i in range(n))
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        f"<< /Type /Pages /Kids [{kids}] /Count {n} >>".encode(),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    for i, lines in enumerate(pages):
+        text = "BT /F1 10 Tf 12 TL 50 780 Td " + " ".join(f"({_escape(l)}) '" for l in lines) + " ET"
+        stream = text.encode("latin-1", "replace")
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {5 + 2 * i} 0 R >>".encode()
+        )
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % off for off in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+def make_pdf_corpus(folder, n_files: int, pages_per_file: int = 5, lines_per_page: int = 40, seed: int = 0):
+    """Schreibt n_files PDFs mit zufälligem Fließtext. Liefert die Pfade."""
+    rng = random.Random(seed)
+    folder = Path(folder)
+    folder.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for f in range(n_files):
+        pages = [[f"Dokument {f} Seite {p + 1}"] + [random_sentence(rng) for _ in range(lines_per_page)]
+                 for p in range(pages_per_file)]
+        path = folder / f"dokument_{f}.pdf"
+        path.write_bytes(pdf_bytes(pages))
+        paths.append(path)
+    return paths
@@ -0,0 +1,272 @@
+# ================================
+# Lokale Stand-ins für Ollama und die GitHub-API
+#
+# Deterministische Antworten mit einstellbarer Latenz, damit Benchmarks
+# ohne GPU, Netzwerk und Rate-Limit reproduzierbar laufen.
+#   FakeOllama:  /api/embed, /api/chat (mit Streaming), /api/generate
+#   FakeGitHub:  /user, /user/repos, /users/<u>/repos, /repos/<o>/<r>,
+#                /repos/<o>/<r>/commits, /repos/<o>/<r>/issues
+# ================================
+
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+
+def fake_embedding(text: str, dim: int = 768):
+    """Deterministischer, normierter Vektor aus dem SHA-256 des Texts."""
+    rng = random.Random(hashlib.sha256(text.encode("utf-8")).digest())
+    vec = [rng.gauss(0.0, 1.0) for _ in range(dim)]
+    norm = sum(v * v for v in vec) ** 0.5 or 1.0
+    return [v / norm for v in vec]
+
+
+class _Server:
+    """Gemeinsame Start/Stop-Logik: HTTP-Server in einem Daemon-Thread."""
+
+    handler = None
+
+    def __init__(self, host="127.0.0.1", port=0):
+        self.httpd = ThreadingHTTPServer((host, port), self.handler)
+        self.httpd.daemon_threads = True
+        self.httpd.app = self
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count(self):
+        with self._lock:
+            self.requests += 1
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class _JSONHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"   # Keep-Alive wie bei den echten Servern
+
+    def log_message(self, *args):
+        pass
+
+    def read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def send_json(self, status, data, headers=None):
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+# ------------------------------
+# OLLAMA
+# ------------------------------
+class _OllamaHandler(_JSONHandler):
+
+    def do_POST(self):
+        app = self.server.app
+        app.count()
+        payload = self.read_json()
+        if self.path == "/api/embed":
+            texts = payload.get("input") or []
+            texts = [texts] if isinstance(texts, str) else texts
+            time.sleep(app.embed_latency + app.embed_per_item * len(texts))
+            self.send_json(200, {"model": payload.get("model"),
+                                 "embeddings": [fake_embedding(t, app.dim) for t in texts]})
+        elif self.path == "/api/chat":
+            self.chat(app, payload)
+        elif self.path == "/api/generate":
+            self.send_json(200, {"model": payload.get("model"), "response": "", "done": True})
+        else:
+            self.send_json(404, {"error": "not found"})
+
+    def chat(self, app, payload):
+        prompt = "".join(m.get("content", "") for m in payload.get("messages", []))
+        tokens = app.answer_tokens(prompt)
+        started = time.perf_counter_ns()
+        time.sleep(app.chat_ttft)
+        stats = {"eval_count": len(tokens), "prompt_eval_count": len(prompt) // 4}
+
+        def final():
+            total = time.perf_counter_ns() - started
+            return {"model": payload.get("model"), "created_at": "2025-01-01T00:00:00Z",
+                    "message": {"role": "assistant", "content": ""}, "done": True,
+                    "done_reason": "stop", "total_duration": total, "load_duration": 0,
+                    "prompt_eval_duration": int(app.chat_ttft * 1e9),
+                    "eval_duration": max(1, total - int(app.chat_ttft * 1e9)), **stats}
+
+        if payload.get("stream", True) is False:
+            time.sleep(app.chat_token_latency * len(tokens))
+            data = final()
+            data["message"]["content"] = "".join(tokens)
+            self.send_json(200, data)
+            return
+
+        # NDJSON-Stream wie bei Ollama (chunked)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def write(obj):
+            line = (json.dumps(obj) + "\n").encode("utf-8")
+            self.wfile.write(f"{len(line):X}\r\n".encode() + line + b"\r\n")
+            self.wfile.flush()
+
+        for token in tokens:
+            write({"model": payload.get("model"), "created_at": "2025-01-01T00:00:00Z",
+                   "message": {"role": "assistant", "content": token}, "done": False})
+            time.sleep(app.chat_token_latency)
+        write(final())
+        self.wfile.write(b"0\r\n\r\n")
+
+
+class FakeOllama(_Server):
+    """Fake-Ollama mit fester Latenz pro Embedding-Request/-Text und pro Chat-Token."""
+
+    handler = _OllamaHandler
+
+    def __init__(self, embed_latency=0.005, embed_per_item=0.0005, chat_ttft=0.05,
+                 chat_token_latency=0.002, chat_tokens=60, dim=768, **kwargs):
+        super().__init__(**kwargs)
+        self.embed_latency = embed_latency
+        self.embed_per_item = embed_per_item
+        self.chat_ttft = chat_ttft
+        self.chat_token_latency = chat_token_latency
+        self.chat_tokens = chat_tokens
+        self.dim = dim
+
+    def answer_tokens(self, prompt: str):
+        # Werkzeugauswahl bekommt gültiges JSON, sonst ein fester Text
+        if "JSON-Format" in prompt:
+            return ['{"action": "get_repo_stats", ', '"arguments": {"repo_name": "repo0", ',
+                    '"username": "bench"}}']
+        words = re.findall(r"\w+", prompt)[-self.chat_tokens:] or ["ok"]
+        return [w + " " for w in (words * self.chat_tokens)[:self.chat_tokens]]
+
+
+# ------------------------------
+# GITHUB
+# ------------------------------
+class _GitHubHandler(_JSONHandler):
+
+    def do_GET(self):
+        app = self.server.app
+        app.count()
+        time.sleep(app.latency)
+        url = urlsplit(self.path)
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        path = url.path.rstrip("/")
+        remaining = {"X-RateLimit-Remaining": "4999", "X-RateLimit-Reset": str(int(time.time()) + 3600)}
+
+        routes = [
+            (r"^/user$", lambda: {"login": "bench"}),
+            (r"^/users?(?:/([^/]+))?/repos$", lambda m: app.repos(m.group(1) or "bench")),
+            (r"^/repos/([^/]+)/([^/]+)$", lambda m: app.repo(m.group(1), m.group(2))),
+            (r"^/repos/([^/]+)/([^/]+)/commits$", lambda m: app.commits(m.group(1), m.group(2))),
+            (r"^/repos/([^/]+)/([^/]+)/issues$", lambda m: app.issues(m.group(1), m.group(2))),
+        ]
+        for pattern, handler in routes:
+            match = re.match(pattern, path)
+            if match:
+                data = handler(match) if handler.__code__.co_argcount else handler()
+                break
+        else:
+            self.send_json(404, {"message": "Not Found"}, remaining)
+            return
+
+        headers = dict(remaining)
+        if isinstance(data, list):
+            data, link = self.paginate(data, query)
+            if link:
+                headers["Link"] = link
+
+        etag = '"%s"' % hashlib.sha1(json.dumps(data, sort_keys=True).encode()).hexdigest()
+        headers["ETag"] = etag
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            for key, value in headers.items():
+                self.send_header(key, value)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_json(200, data, headers)
+
+    def paginate(self, items, query):
+        per_page = int(query.get("per_page", 30))
+        page = int(query.get("page", 1))
+        last = max(1, -(-len(items) // per_page))
+        link = None
+        if last > 1:
+            base = {k: v for k, v in query.items() if k != "page"}
+            params = "&".join(f"{k}={v}" for k, v in base.items())
+            host = self.headers.get("Host", "localhost")
+            links = []
+            if page < last:
+                links.append(f'<http://{host}{urlsplit(self.path).path}?{params}&page={page + 1}>; rel="next"')
+            links.append(f'<http://{host}{urlsplit(self.path).path}?{params}&page={last}>; rel="last"')
+            link = ", ".join(links)
+        return items[(page - 1) * per_page:page * per_page], link
+
+
+class FakeGitHub(_Server):
+    """Fake-GitHub-API mit ETag, Link-Header (Paginierung) und Rate-Limit-Headern."""
+
+    handler = _GitHubHandler
+
+    def __init__(self, latency=0.02, n_repos=120, n_commits=250, n_issues=12, **kwargs):
+        super().__init__(**kwargs)
+        self.latency = latency
+        self.n_repos = n_repos
+        self.n_commits = n_commits
+        self.n_issues = n_issues
+
+    @staticmethod
+    def _date(i: int):
+        return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(1_700_000_000 - i * 3600))
+
+    def repo(self, owner, name, i=0):
+        return {"name": name, "full_name": f"{owner}/{name}", "description": f"Benchmark-Repo {name}",
+                "stargazers_count": 10 * i + 3, "forks_count": i, "open_issues_count": self.n_issues,
+                "language": ("Python", "C", "C++", None)[i % 4], "private": i % 5 == 0,
+                "updated_at": self._date(i)}
+
+    def repos(self, owner):
+        return [self.repo(owner, f"repo{i}", i) for i in range(self.n_repos)]
+
+    def commits(self, owner, name):
+        return [{"sha": f"{i:040x}",
+                 "commit": {"message": f"Commit {i} in {name}\n\nDetails",
+                            "author": {"name": "Bench", "date": self._date(i)}}}
+                for i in range(self.n_commits)]
+
+    def issues(self, owner, name):
+        return [{"title": f"Issue {i}", "user": {"login": f"user{i}"}, "state": "open"}
+                for i in range(self.n_issues)]
@@ -0,0 +1,149 @@
+# ================================
+# Benchmark-Suite für Indexierung, Suche und GitHub-Tools
+#
+# Startet Fake-Ollama und Fake-GitHub lokal, erzeugt synthetische Korpora
+# in mehreren Größen und führt jedes Szenario in einem eigenen Prozess aus.
+# Ergebnis ist eine JSON-Datei mit p50/p95-Latenzen und Durchsatz, die sich
+# zwischen Commits vergleichen lässt:
+#
+#   python benchmarks/run_benchmarks.py --sizes 10,50 --output vorher.json
+#   python benchmarks/run_benchmarks.py --sizes 10,50 --compare vorher.json
+# ================================
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from corpus import make_code_corpus, make_pdf_corpus
+from fake_servers import FakeOllama, FakeGitHub
+
+HERE = Path(__file__).resolve().parent
+ROOT = HERE.parent
+
+# Szenarien, die pro Korpusgröße laufen bzw. nur einmal
+SIZED_SCENARIOS = ("split_code", "process_pdf", "index_files", "add_documents", "retrieval", "server",
+                   "vector_store")
+SINGLE_SCENARIOS = ("github",)
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_scenario(name, size, repeat, env, workdir, timeout):
+    """Startet ein Szenario in einem frischen Prozess und liest dessen JSON-Ergebnis."""
+    out = workdir / f"{name}_{size}.json"
+    cmd = [sys.executable, str(HERE / "scenarios.py"), name, "--out", str(out),
+           "--size", str(size), "--repeat", str(repeat)]
+    started = time.perf_counter()
+    try:
+        proc = subprocess.run(cmd, env=env, cwd=workdir, capture_output=True, text=True, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        return {"fehler": f"Zeitüberschreitung nach {timeout} s"}
+    if not out.exists():
+        return {"fehler": (proc.stderr or proc.stdout).strip()[-2000:]}
+    result = json.loads(out.read_text(encoding="utf-8"))
+    result["laufzeit_s"] = round(time.perf_counter() - started, 2)
+    return result
+
+
+def compare(old, new, path=""):
+    """Vergleicht p50/p95/Durchsatz zweier Ergebnisse und liefert Zeilen mit der Änderung in %."""
+    lines = []
+    for key, value in new.items():
+        other = old.get(key) if isinstance(old, dict) else None
+        if isinstance(value, dict):
+            lines += compare(other or {}, value, f"{path}/{key}")
+        elif key in ("p50_ms", "p95_ms", "durchsatz_pro_s") and isinstance(other, (int, float)) and other:
+            change = (value - other) / other * 100
+            lines.append(f"{path}/{key}: {other} → {value} ({change:+.1f} %)")
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark-Suite mit lokalen Fake-Servern.")
+    parser.add_argument("--sizes", default="10,50", help="Korpusgrößen (Dateien je Art), kommagetrennt")
+    parser.add_argument("--scenarios", default=",".join(SIZED_SCENARIOS + SINGLE_SCENARIOS))
+    parser.add_argument("--repeat", type=int, default=20, help="Wiederholungen für Latenzmessungen")
+    parser.add_argument("--embed-latency", type=float, default=0.005, help="Sekunden pro Embedding-Request")
+    parser.add_argument("--embed-per-item", type=float, default=0.0005, help="Sekunden pro eingebettetem Text")
+    parser.add_argument("--chat-ttft", type=float, default=0.05, help="Sekunden bis zum ersten Chat-Token")
+    parser.add_argument("--chat-token-latency", type=float, default=0.002, help="Sekunden pro Chat-Token")
+    parser.add_argument("--github-latency", type=float, default=0.02, help="Sekunden pro GitHub-Request")
+    parser.add_argument("--timeout", type=int, default=900, help="Maximale Sekunden pro Szenario")
+    parser.add_argument("--output", help="Ergebnis-JSON (Standard: benchmarks/results/<commit>.json)")
+    parser.add_argument("--compare", help="Früheres Ergebnis-JSON zum Vergleich")
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+    scenarios = [s for s in args.scenarios.split(",") if s]
+    config = {k: v for k, v in vars(args).items() if k not in ("output", "compare")}
+
+    ollama = FakeOllama(embed_latency=args.embed_latency, embed_per_item=args.embed_per_item,
+                        chat_ttft=args.chat_ttft, chat_token_latency=args.chat_token_latency).start()
+    github = FakeGitHub(latency=args.github_latency).start()
+    results = {}
+    try:
+        with tempfile.TemporaryDirectory(prefix="rag_bench_") as tmp:
+            tmp = Path(tmp)
+            base_env = dict(os.environ, OLLAMA_HOST=ollama.url, GITHUB_API_URL=github.url,
+                            GITHUB_TOKEN="benchmark", PYTHONIOENCODING="utf-8")
+
+            for name in scenarios:
+                for size in (sizes if name in SIZED_SCENARIOS else [None]):
+                    # Eigenes Verzeichnis pro Lauf → leere Datenbank und Caches
+                    workdir = tmp / f"{name}_{size or 0}"
+                    corpus = tmp / f"corpus_{size or 0}"
+                    if size and not corpus.exists():
+                        make_code_corpus(corpus / "code", size)
+                        make_pdf_corpus(corpus / "docs", size)
+                    workdir.mkdir()
+                    env = dict(base_env,
+                               RAG_PERSIST_DIR=str(workdir / "db" / "chroma_db"),
+                               RAG_PDF_DIR=str(corpus / "docs"),
+                               RAG_CODE_DIR=str(corpus / "code"),
+                               GITHUB_CACHE_PATH=str(workdir / "github_cache.sqlite"))
+
+                    label = f"{name} (Größe {size})" if size else name
+                    print(f"→ {label} ...", flush=True)
+                    result = run_scenario(name, size or 0, args.repeat, env, workdir, args.timeout)
+                    if "fehler" in result:
+                        print(f"  Fehler: {result['fehler']}")
+                    results.setdefault(name, {})[str(size) if size else "alle"] = result
+    finally:
+        ollama.stop()
+        github.stop()
+
+    report = {
+        "zeitpunkt": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "plattform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "konfiguration": config,
+        "ergebnisse": results,
+    }
+    output = Path(args.output) if args.output else HERE / "results" / f"{report['git_commit'] or 'ohne_git'}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+    print(f"\nErgebnis gespeichert: {output}")
+
+    if args.compare:
+        old = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        print(f"\nVergleich mit {args.compare} (Commit {old.get('git_commit')}):")
+        for line in compare(old.get("ergebnisse", {}), results):
+            print("  " + line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,374 @@
+# ================================
+# Einzelne Benchmark-Szenarien
+#
+# Wird von run_benchmarks.py pro Szenario in einem eigenen Prozess gestartet,
+# damit jeder Lauf mit leeren Caches und eigener Datenbank beginnt. Die
+# Umgebungsvariablen (OLLAMA_HOST, GITHUB_API_URL, RAG_*_DIR, ...) setzt der
+# Aufrufer; das Ergebnis wird als JSON in die Datei --out geschrieben.
+#
+#   python benchmarks/scenarios.py <szenario> --out ergebnis.json [--size N] [--repeat N]
+# ================================
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+# Hauptprogramm (request.py usw.) und corpus.py importierbar machen
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(1, str(Path(__file__).resolve().parent))
+
+
+def percentile(samples, q: float):
+    """Perzentil nach Nearest-Rank (q zwischen 0 und 100)."""
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    rank = max(1, -(-len(ordered) * q // 100))
+    return ordered[int(rank) - 1]
+
+
+def summarize(samples, units: float = None, unit: str = None) -> dict:
+    """Fasst Laufzeiten (Sekunden) zusammen: p50/p95/Mittel in ms und Durchsatz.
+
+    units ist die Gesamtmenge der Arbeit über alle samples (z. B. Dateien oder
+    Chunks); ohne Angabe zählt jedes sample als eine Einheit."""
+    total = sum(samples)
+    units = len(samples) if units is None else units
+    return {
+        "n": len(samples),
+        "p50_ms": round(percentile(samples, 50) * 1000, 2),
+        "p95_ms": round(percentile(samples, 95) * 1000, 2),
+        "mittel_ms": round(total / len(samples) * 1000, 2) if samples else 0.0,
+        "durchsatz_pro_s": round(units / total, 2) if total else 0.0,
+        "einheit": unit or "aufrufe",
+    }
+
+
+def timed(fn, *args, **kwargs):
+    started = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return time.perf_counter() - started, result
+
+
+@contextlib.contextmanager
+def quiet():
+    """Unterdrückt die Konsolenausgabe des Hauptprogramms während der Messung."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+# ------------------------------
+# SZENARIEN
+# ------------------------------
+def bench_split_code(args):
+    from document_parser import split_code_text
+    texts = [p.read_text(encoding="utf-8") for p in sorted(Path(os.environ["RAG_CODE_DIR"]).glob("*.py"))]
+    samples, chunks = [], 0
+    for _ in range(args.repeat):
+        for text in texts:
+            seconds, result = timed(split_code_text, text, 500, 100)
+            samples.append(seconds)
+            chunks += len(result)
+    mb = args.repeat * sum(len(t.encode("utf-8")) for t in texts) / 1e6
+    return {"pro_datei": summarize(samples, len(samples), "dateien"),
+            "chunks": summarize(samples, chunks, "chunks"),
+            "mb_pro_s": round(mb / sum(samples), 2)}
+
+
+def bench_process_pdf(args):
+    from document_parser import process_pdf
+    paths = sorted(Path(os.environ["RAG_PDF_DIR"]).glob("*.pdf"))
+    # Erster Aufruf lädt langchain/PyPDF2 – getrennt ausweisen statt p95 zu verfälschen
+    with quiet():
+        import_seconds, _ = timed(process_pdf, str(paths[0]))
+    samples, chunks, pages = [], 0, 0
+    for path in paths:
+        with quiet():
+            seconds, (docs, _, metas) = timed(process_pdf, str(path))
+        samples.append(seconds)
+        chunks += len(docs)
+        # "pages" ist "3" oder ein Bereich wie "3-4"
+        covered = set()
+        for meta in metas:
+            first, _, last = meta["pages"].partition("-")
+            covered.update(range(int(first), int(last or first) + 1))
+        pages += len(covered)
+    return {"pro_datei": summarize(samples, len(samples), "dateien"),
+            "seiten": summarize(samples, pages, "seiten"),
+            "chunks": summarize(samples, chunks, "chunks"),
+            "erster_aufruf_ms": round(import_seconds * 1000, 2)}
+
+
+def bench_index_files(args):
+    import request
+    with quiet():
+        cold, _ = timed(request.index_files)
+        chunks = request.collection.count()
+        warm, _ = timed(request.index_files)
+    files = len(list(request.discover_files()))
+    return {"kalt": summarize([cold], files, "dateien"),
+            "kalt_chunks": summarize([cold], chunks, "chunks"),
+            "unveraendert": summarize([warm], files, "dateien")}
+
+
+def bench_add_documents(args):
+    import random
+    import request
+    from corpus import random_sentence
+    rng = random.Random(1)
+    n = args.size * 20
+    docs = [" ".join(random_sentence(rng) for _ in range(6)) for _ in range(n)]
+    ids = [f"bench_chunk{i}" for i in range(n)]
+    metas = [{"filename": "bench.txt", "type": "text", "chunk_index": i} for i in range(n)]
+    with quiet():
+        request.get_collection()
+        seconds, failed = timed(request.add_new_documents, request.collection, docs, ids, metas)
+        again, _ = timed(request.add_new_documents, request.collection, docs, ids, metas)
+    return {"neu": summarize([seconds], n, "chunks"),
+            "bereits_vorhanden": summarize([again], n, "chunks"),
+            "fehlgeschlagen": len(failed)}
+
+
+def bench_retrieval(args):
+    import request
+    with quiet():
+        request.index_files()
+    questions = [f"Was macht func_{i % max(1, args.size)}_{i % 20} mit limit und value?" for i in range(args.repeat)]
+
+    with quiet():
+        cold = [timed(request.retrieve, q)[0] for q in questions]
+        warm = [timed(request.retrieve, q)[0] for q in questions]
+        if request.answer_cache is not None:
+            request.answer_cache.clear()
+        answer = [timed(request.ask_rag, q)[0] for q in questions[:max(1, args.repeat // 4)]]
+    return {"retrieve_kalt": summarize(cold), "retrieve_cache": summarize(warm),
+            "ask_rag": summarize(answer)}
+
+
+def _post_json(port, path, payload):
+    import http.client
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=120)
+    try:
+        conn.request("POST", path, json.dumps(payload), {"Content-Type": "application/json"})
+        response = conn.getresponse()
+        data = json.loads(response.read())
+        if response.status != 200:
+            raise RuntimeError(data.get("fehler"))
+        return data
+    finally:
+        conn.close()
+
+
+def bench_server(args):
+    """Gleiche Anzahl RAG-Fragen erst nacheinander, dann von mehreren Clients gleichzeitig."""
+    import asyncio
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+    import embeddings
+    import request
+    import server
+
+    with quiet():
+        request.index_files()
+    batcher = embeddings.QueryBatcher()
+    embeddings.set_query_batcher(batcher)
+    loop = asyncio.new_event_loop()
+    httpd = loop.run_until_complete(server.start_server("127.0.0.1", 0))
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    port = httpd.sockets[0].getsockname()[1]
+
+    clients = 8
+    n = max(clients, args.repeat)
+
+    def ask(question):
+        seconds, data = timed(_post_json, port, "/api/ask", {"question": question, "mode": "rag", "stream": False})
+        if "antwort" not in data:
+            raise RuntimeError(data)
+        return seconds
+
+    # Jede Phase mit eigenen Fragen, damit keine Caches greifen
+    sequential = [ask(f"Was macht func_{i % max(1, args.size)}_{i % 20}? (a{i})") for i in range(n)]
+    before = batcher.stats()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        concurrent = list(pool.map(ask, [f"Was macht func_{i % max(1, args.size)}_{i % 20}? (b{i})"
+                                         for i in range(n)]))
+    wall = time.perf_counter() - started
+    after = batcher.stats()
+    loop.call_soon_threadsafe(httpd.close)
+
+    batches = after["batches"] - before["batches"]
+    texts = after["texte"] - before["texte"]
+    return {"nacheinander": summarize(sequential, n, "fragen"),
+            "gleichzeitig": dict(summarize(concurrent, n, "fragen"),
+                                 durchsatz_pro_s=round(n / wall, 2), clients=clients),
+            "embedding_requests_gleichzeitig": batches,
+            "fragen_pro_embedding_request": round(texts / batches, 2) if batches else 0.0}
+
+
+VECTOR_BACKENDS = ("chroma", "float32", "float16", "int8")
+
+
+def _open_vector_store(backend, path):
+    if backend == "chroma":
+        from chromadb import PersistentClient
+        from vector_store import ChromaStore
+        return ChromaStore(PersistentClient(path=str(path)), "bench", {"hnsw:space": "cosine"})
+    from vector_store import NumpyStore
+    return NumpyStore(path, dtype=backend)
+
+
+def _rss_mb():
+    """Aktuell belegter Arbeitsspeicher des Prozesses in MB, inklusive gemappter
+    Dateiseiten (psutil, sonst /proc; None, wenn beides fehlt)."""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / 1e6
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def bench_vector_store(args):
+    """Baut pro Backend einen Speicher mit size * 1000 Vektoren und misst Start,
+    Speicher und Suche jeweils in einem frischen Prozess (vector_query)."""
+    import subprocess
+    import numpy as np
+    n, dim = args.size * 1000, 768
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((n, dim), dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    # Anfragen in der Nähe gespeicherter Vektoren: Rauschen mit Norm ≈ 0.3 (pro
+    # Komponente / sqrt(dim)), der Ausgangsvektor bleibt also klar der nächste.
+    # Referenz für recall@10 ist die exakte Suche, für recall@1 der Ausgangsvektor.
+    sources = rng.integers(0, n, args.repeat)
+    noise = 0.3 / np.sqrt(dim) * rng.standard_normal((args.repeat, dim), dtype=np.float32)
+    queries = vectors[sources] + noise
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    np.save("queries.npy", queries)
+    np.save("truth.npy", np.argsort(-(queries @ vectors.T), axis=1)[:, :10])
+    np.save("sources.npy", sources)
+
+    ids = [f"chunk{i}" for i in range(n)]
+    result = {}
+    for backend in VECTOR_BACKENDS:
+        path = Path(f"vs_{backend}")
+        store = _open_vector_store(backend, path)
+        started = time.perf_counter()
+        for start in range(0, n, 1000):
+            end = min(start + 1000, n)
+            store.add(ids[start:end], vectors[start:end].tolist(), [f"Dokument {i}" for i in range(start, end)],
+                      [{"chunk_index": i} for i in range(start, end)])
+        build = time.perf_counter() - started
+        del store
+
+        out = Path(f"vector_query_{backend}.json")
+        proc = subprocess.run([sys.executable, __file__, "vector_query", "--out", str(out), "--backend", backend,
+                               "--path", str(path), "--repeat", str(args.repeat)], capture_output=True, text=True)
+        measured = json.loads(out.read_text(encoding="utf-8")) if out.exists() else {"fehler": proc.stderr[-2000:]}
+        measured["aufbau"] = summarize([build], n, "vektoren")
+        measured["platte_mb"] = round(sum(f.stat().st_size for f in path.rglob("*") if f.is_file()) / 1e6, 1)
+        result[backend] = measured
+    return result
+
+
+def bench_vector_query(args):
+    """Öffnet einen bestehenden Speicher und misst Startzeit, Suche, Trefferquote und Speicher."""
+    import numpy as np
+    queries, truth, sources = np.load("queries.npy"), np.load("truth.npy"), np.load("sources.npy")
+    # Module vorab laden: gemessen wird nur, was das Öffnen und Suchen zusätzlich braucht
+    if args.backend == "chroma":
+        import chromadb  # noqa: F401
+    import vector_store  # noqa: F401
+    baseline = _rss_mb()
+
+    open_seconds, store = timed(_open_vector_store, args.backend, args.path)
+    first, _ = timed(store.query, [queries[0].tolist()], 10, [])
+    samples, recall, recall_source = [], [], []
+    for q, expected, source in zip(queries, truth, sources):
+        seconds, found = timed(store.query, [q.tolist()], 10, [])
+        samples.append(seconds)
+        ranked = [int(cid[len("chunk"):]) for cid in found["ids"][0]]
+        recall.append(len(set(ranked) & set(expected.tolist())) / len(expected))
+        recall_source.append(1.0 if ranked[:1] == [int(source)] else 0.0)
+    batch, _ = timed(store.query, queries.tolist(), 10, [])
+    rss = _rss_mb()
+    return {"oeffnen_ms": round(open_seconds * 1000, 2),
+            "erste_anfrage_ms": round(first * 1000, 2),
+            "anfrage": summarize(samples),
+            "batch_pro_anfrage_ms": round(batch / len(queries) * 1000, 3),
+            "recall_at_10": round(sum(recall) / len(recall), 4),
+            "recall_at_1_quelle": round(sum(recall_source) / len(recall_source), 4),
+            "speicher_mb": round(rss - baseline, 1) if rss is not None and baseline is not None else None}
+
+
+def bench_github(args):
+    import github_tool
+    calls = {
+        "get_repo_stats": lambda: github_tool.get_repo_stats("repo1", "bench"),
+        "get_last_commit": lambda: github_tool.get_last_commit("bench", "repo1"),
+        "list_open_issues": lambda: github_tool.list_open_issues("bench", "repo1"),
+        "list_user_repos": lambda: github_tool.list_user_repos("bench", 50),
+    }
+    # Client und Cache vorab erzeugen (Import von PyGithub zählt nicht zur Aufruf-Latenz)
+    github_tool.get_github()
+    cache = github_tool.get_response_cache()
+    result = {}
+    for name, call in calls.items():
+        cold, warm = [], []
+        for _ in range(args.repeat):
+            with cache._lock:
+                cache.conn.execute("DELETE FROM responses")
+                cache.conn.commit()
+            # PyGithub hält standardmäßig 0,25 s Abstand zwischen Requests; im
+            # interaktiven Betrieb liegen Fragen weiter auseinander, also hier auch
+            time.sleep(0.3)
+            seconds, data = timed(call)
+            if isinstance(data, dict) and "fehler" in data:
+                raise RuntimeError(data["fehler"])
+            cold.append(seconds)
+            warm.append(timed(call)[0])
+        result[name] = {"kalt": summarize(cold), "cache": summarize(warm)}
+    return result
+
+
+SCENARIOS = {
+    "split_code": bench_split_code,
+    "process_pdf": bench_process_pdf,
+    "index_files": bench_index_files,
+    "add_documents": bench_add_documents,
+    "retrieval": bench_retrieval,
+    "server": bench_server,
+    "vector_store": bench_vector_store,
+    "vector_query": bench_vector_query,
+    "github": bench_github,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Führt ein einzelnes Benchmark-Szenario aus.")
+    parser.add_argument("scenario", choices=sorted(SCENARIOS))
+    parser.add_argument("--out", required=True)
+    parser.add_argument("--size", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--backend", choices=VECTOR_BACKENDS, help="nur vector_query")
+    parser.add_argument("--path", help="nur vector_query: Speicherort des Backends")
+    args = parser.parse_args()
+    try:
+        result = SCENARIOS[args.scenario](args)
+    except Exception as e:
+        result = {"fehler": f"{type(e).__name__}: {e}"}
+    Path(args.out).write_text(json.dumps(result), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
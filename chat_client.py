@@ -0,0 +1,144 @@
+# ================================
+# Chat-Aufrufe an Ollama mit Vorwärmen und Zeitmessung
+#
+# Alle Chat-Requests laufen über stream_chat(): gleiches keep_alive, damit
+# das Modell zwischen Fragen geladen bleibt, und Messung der Zeit bis zum
+# ersten Token, der Tokens pro Sekunde und der Generierungszeit pro Anfrage
+# (aus den Statistiken, die Ollama mit dem letzten Stream-Chunk liefert).
+# warm_up() lädt Chat- und Embedding-Modell beim Start im Hintergrund,
+# sodass die erste Frage nicht die Ladezeit bezahlt.
+# ================================
+
+import threading
+import time
+
+import metrics
+
+CHAT_KEEP_ALIVE = "30m"     # So lange hält Ollama das Chat-Modell geladen
+
+_lock = threading.Lock()
+_stats = {}                 # Art der Anfrage → aufsummierte Messwerte
+_warmup = {"status": "aus", "dauer_ms": None}
+
+
+def _record(label: str, ttft: float, tokens: int, eval_seconds: float, total_seconds: float):
+    with _lock:
+        entry = _stats.setdefault(label, {"anzahl": 0, "ttft": 0.0, "letzte_ttft": 0.0,
+                                          "tokens": 0, "eval": 0.0, "gesamt": 0.0})
+        entry["anzahl"] += 1
+        entry["ttft"] += ttft
+        entry["letzte_ttft"] = ttft
+        entry["tokens"] += tokens
+        entry["eval"] += eval_seconds
+        entry["gesamt"] += total_seconds
+
+
+class ChatStream:
+    """Streamt die Antwort des Modells als Textstücke und misst die Latenz.
+
+    Nach dem Durchlaufen stehen die Zeit bis zum ersten Token (ttft), die
+    erzeugten Tokens (eval_count), die Generierungsrate (tokens_per_second)
+    und die Gesamtzeit (total_seconds) bereit; sie werden außerdem pro label
+    gesammelt (siehe chat_stats())."""
+
+    def __init__(self, model: str, messages, label: str = "chat", keep_alive=CHAT_KEEP_ALIVE, **kwargs):
+        self.model = model
+        self.messages = messages
+        self.label = label
+        self.keep_alive = keep_alive
+        self.kwargs = kwargs
+        self.ttft = None
+        self.eval_count = 0
+        self.eval_seconds = 0.0
+        self.total_seconds = None
+
+    @property
+    def tokens_per_second(self):
+        return self.eval_count / self.eval_seconds if self.eval_seconds else 0.0
+
+    def __iter__(self):
+        import ollama
+        started = time.perf_counter()
+        prompt_tokens = 0
+        for chunk in ollama.chat(model=self.model, messages=self.messages, stream=True,
+                                 keep_alive=self.keep_alive, **self.kwargs):
+            text = chunk["message"]["content"]
+            if self.ttft is None and text:
+                self.ttft = time.perf_counter() - started
+            if chunk.get("done"):
+                # Ollama liefert Dauern in Nanosekunden
+                self.eval_count = chunk.get("eval_count") or 0
+                self.eval_seconds = (chunk.get("eval_duration") or 0) / 1e9
+                prompt_tokens = chunk.get("prompt_eval_count") or 0
+                if chunk.get("total_duration"):
+                    self.total_seconds = chunk["total_duration"] / 1e9
+            yield text
+
+        # Erst nach dem Stream erfassen: ein offener Span über yield hinweg
+        # würde anderen Stufen des Aufrufers fälschlich als Eltern-Span dienen
+        metrics.record(f"chat.{self.label}", time.perf_counter() - started,
+                       tokens=self.eval_count, prompt_tokens=prompt_tokens)
+
+        if self.total_seconds is None:
+            self.total_seconds = time.perf_counter() - started
+        if self.ttft is not None:
+            metrics.record(f"chat.{self.label}.ttft", self.ttft)
+            _record(self.label, self.ttft, self.eval_count, self.eval_seconds, self.total_seconds)
+
+    def report(self):
+        """Gibt Zeit bis zum ersten Token, Tokens pro Sekunde und Gesamtzeit aus."""
+        if self.ttft is not None:
+            print(f"\n[{self.label}] Erstes Token nach {self.ttft * 1000:.0f} ms | "
+                  f"{self.eval_count} Tokens, {self.tokens_per_second:.1f} Tokens/s | "
+                  f"gesamt {self.total_seconds:.2f} s")
+
+
+def stream_chat(model: str, messages, label: str = "chat", keep_alive=CHAT_KEEP_ALIVE, **kwargs) -> ChatStream:
+    return ChatStream(model, messages, label, keep_alive, **kwargs)
+
+
+def chat_stats() -> dict:
+    """Mittelwerte pro Art der Anfrage: Zeit bis zum ersten Token, Tokens/s und Gesamtzeit."""
+    with _lock:
+        return {
+            label: {"anzahl": e["anzahl"],
+                    "ttft_mittel_ms": round(1000 * e["ttft"] / e["anzahl"], 1),
+                    "ttft_letzte_ms": round(1000 * e["letzte_ttft"], 1),
+                    "tokens_pro_s": round(e["tokens"] / e["eval"], 1) if e["eval"] else 0.0,
+                    "gesamt_mittel_s": round(e["gesamt"] / e["anzahl"], 2)}
+            for label, e in _stats.items()
+        }
+
+
+def warm_up(model: str, system_prompt: str = None, embed_model: str = None, keep_alive=CHAT_KEEP_ALIVE):
+    """Lädt Chat- und Embedding-Modell in einem Hintergrund-Thread.
+
+    Mit system_prompt wird zusätzlich der gemeinsame Prompt-Anfang einmal
+    verarbeitet, damit Ollama ihn für die erste echte Frage wiederverwenden kann."""
+    def run():
+        started = time.perf_counter()
+        _warmup["status"] = "läuft"
+        try:
+            import ollama
+            if system_prompt:
+                ollama.chat(model=model, messages=[{"role": "system", "content": system_prompt}],
+                            keep_alive=keep_alive, options={"num_predict": 1})
+            else:
+                # Leerer Prompt lädt nur das Modell
+                ollama.generate(model=model, prompt="", keep_alive=keep_alive)
+            if embed_model:
+                from embeddings import get_embedding_client
+                get_embedding_client().embed(["warm-up"], embed_model)
+        except Exception as e:
+            _warmup["status"] = f"fehlgeschlagen ({e})"
+            return
+        _warmup["status"] = "fertig"
+        _warmup["dauer_ms"] = round((time.perf_counter() - started) * 1000)
+
+    thread = threading.Thread(target=run, name="warm-up", daemon=True)
+    thread.start()
+    return thread
+
+
+def warmup_status() -> dict:
+    return dict(_warmup)
@@ -0,0 +1,240 @@
+# ================================
+# Kontextaufbau für RAG-Prompts
+#
+# Aus überzählig abgerufenen Treffern wird ein kompakter Kontext:
+#   1. Fast-Duplikate entfernen (Jaccard über Wort-Trigramme)
+#   2. Vielfalt per MMR (Relevanz aus der Trefferreihenfolge, Ähnlichkeit
+#      über Wort-Trigramme – braucht keine zusätzlichen Embeddings)
+#   3. Benachbarte Chunks derselben Datei zusammenführen und die Überlappung
+#      aus dem Chunking nur einmal übernehmen
+#   4. In ein Token-Budget packen (grobe Schätzung: 4 Zeichen ≈ 1 Token)
+#   5. Freies Budget mit noch nicht übernommenen Treffern auffüllen
+# Steht ein Chunk in mehreren Dateien (meta["sources"]), nennt die
+# Quellenangabe auch die übrigen Fundstellen.
+# ================================
+
+import os
+import re
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+CHARS_PER_TOKEN = 4
+MAX_LISTED_SOURCES = 3     # Weitere Fundstellen, die in der Quellenangabe ausgeschrieben werden
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _shingles(text: str, n: int = 3):
+    words = [w.lower() for w in _WORD_RE.findall(text)]
+    if len(words) < n:
+        return {tuple(words)} if words else set()
+    return {tuple(words[i:i + n]) for i in range(len(words) - n + 1)}
+
+
+def _jaccard(a, b) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def _merge_overlap(first: str, second: str, max_chars: int = 1000) -> str:
+    """Hängt second an first an und lässt dabei den überlappenden Anfang von second weg.
+
+    Zuerst zeilenweise (Code-Chunks überlappen um ganze Zeilen, der Anfang ist
+    aber per strip() ohne Einrückung), sonst zeichenweise (PDF-Chunks)."""
+    a_lines, b_lines = first.split("\n"), second.split("\n")
+    for k in range(min(len(a_lines), len(b_lines)), 0, -1):
+        if [l.strip() for l in a_lines[-k:]] == [l.strip() for l in b_lines[:k]]:
+            return "\n".join(a_lines + b_lines[k:])
+
+    for k in range(min(len(first), len(second), max_chars), 19, -1):
+        if first.endswith(second[:k]):
+            return first + second[k:]
+    return first + "\n" + second
+
+
+class ContextBlock:
+    """Zusammenhängender Textabschnitt einer Quelle mit den IDs aller enthaltenen Chunks."""
+
+    def __init__(self, text: str, source: str, chunk_ids, rank: int = 0):
+        self.text = text
+        self.source = source
+        self.chunk_ids = list(chunk_ids)
+        self.pages = []
+        self.paths = []           # Alle Dateien mit diesem Text, die eigene zuerst
+        self.rank = rank          # Beste Trefferposition der enthaltenen Chunks
+        self.parts = []           # Die enthaltenen Treffer, nach chunk_index sortiert
+
+    def add_paths(self, paths):
+        for path in paths:
+            if path not in self.paths:
+                self.paths.append(path)
+
+    @property
+    def label(self) -> str:
+        label = self.source
+        if self.pages:
+            first = min(int(p.split("-")[0]) for p in self.pages)
+            last = max(int(p.split("-")[-1]) for p in self.pages)
+            label += f", Seite {first}" + (f"-{last}" if last > first else "")
+        others = self.paths[1:]
+        if others:
+            listed = ", ".join(_short_path(p) for p in others[:MAX_LISTED_SOURCES])
+            more = len(others) - MAX_LISTED_SOURCES
+            label += f" (auch in {listed}" + (f" und {more} weiteren" if more > 0 else "") + ")"
+        return label
+
+
+def _short_path(path: str) -> str:
+    """Ordner und Dateiname – kopierte Dateien heißen oft gleich."""
+    return os.path.join(os.path.basename(os.path.dirname(path)), os.path.basename(path))
+
+
+def _source(meta: dict) -> str:
+    meta = meta or {}
+    return meta.get("path") or meta.get("filename") or meta.get("source") or "?"
+
+
+def _make_block(chunks, source: str) -> ContextBlock:
+    """Block aus benachbarten Treffern derselben Datei (nach chunk_index sortiert)."""
+    meta = chunks[0]["meta"]
+    block = ContextBlock(chunks[0]["text"], meta.get("filename") or meta.get("source") or source,
+                         [], rank=min(c["rank"] for c in chunks))
+    block.paths.append(source)
+    for i, c in enumerate(chunks):
+        if i:
+            block.text = _merge_overlap(block.text, c["text"])
+        block.chunk_ids.append(c["id"])
+        block.add_paths(c["meta"].get("sources") or [])
+        if c["meta"].get("pages"):
+            block.pages.append(str(c["meta"]["pages"]))
+    block.parts = list(chunks)
+    return block
+
+
+def _cost(block: ContextBlock) -> int:
+    """Tokens des Blocks im Prompt, inklusive Quellenangabe."""
+    return estimate_tokens(block.label) + 1 + estimate_tokens(block.text)
+
+
+def _trim(block: ContextBlock, budget: int) -> ContextBlock:
+    """Kürzt einen Block auf die längste zusammenhängende Folge von Chunks um
+    seinen besten Treffer, die in budget passt (notfalls nur der beste Chunk)."""
+    parts, source = block.parts, block.paths[0]
+    best = min(range(len(parts)), key=lambda i: parts[i]["rank"])
+    fitting = _make_block([parts[best]], source)
+    for start in range(best + 1):
+        for end in range(len(parts), best, -1):
+            if end - start <= len(fitting.parts):
+                break
+            candidate = _make_block(parts[start:end], source)
+            if _cost(candidate) <= budget:
+                fitting = candidate
+                break
+    return fitting
+
+
+def build_context(hits, token_budget: int = 500, mmr_lambda: float = 0.7,
+                  duplicate_threshold: float = 0.8):
+    """Baut aus Treffern [(id, text, meta), ...] (bestes zuerst) kompakte Kontextblöcke.
+
+    Liefert (Blöcke, Statistik); die Blöcke sind nach der besten enthaltenen
+    Trefferposition sortiert und passen zusammen in token_budget."""
+    candidates = []
+    for rank, (cid, text, meta) in enumerate(hits):
+        if text:
+            candidates.append({"id": cid, "text": text, "meta": meta or {}, "rank": rank,
+                               "shingles": _shingles(text)})
+    stats = {"kandidaten": len(candidates),
+             "tokens_vorher": sum(estimate_tokens(c["text"]) for c in candidates)}
+
+    # 1. Fast-Duplikate (z. B. gleiche Passage in zwei Dateien) verwerfen
+    unique = []
+    for c in candidates:
+        if all(_jaccard(c["shingles"], u["shingles"]) < duplicate_threshold for u in unique):
+            unique.append(c)
+    stats["duplikate"] = len(candidates) - len(unique)
+
+    # 2. MMR: relevant, aber möglichst verschieden von bereits gewählten Chunks.
+    #    Direkte Nachbarn derselben Datei zählen nicht als redundant – sie
+    #    werden in Schritt 3 ohnehin zusammengeführt.
+    #    Etwas über das Budget hinaus wählen, da das Zusammenführen Überlappungen spart.
+    selected, remaining, used = [], list(unique), 0
+    while remaining and used < token_budget * 1.25:
+        def mmr(c):
+            relevance = 1.0 / (1 + c["rank"])
+            redundancy = max((_jaccard(c["shingles"], s["shingles"]) for s in selected
+                              if not _adjacent(c, s)), default=0.0)
+            return mmr_lambda * relevance - (1 - mmr_lambda) * redundancy
+
+        best = max(remaining, key=mmr)
+        remaining.remove(best)
+        selected.append(best)
+        used += estimate_tokens(best["text"])
+
+    # 3. Benachbarte Chunks derselben Datei zu einem Block zusammenführen
+    blocks = []
+    by_source = {}
+    for c in selected:
+        by_source.setdefault(_source(c["meta"]), []).append(c)
+    for source, chunks in by_source.items():
+        chunks.sort(key=lambda c: (c["meta"].get("chunk_index") is None, c["meta"].get("chunk_index", 0)))
+        run = []
+        for c in chunks:
+            if run and not _adjacent(c, run[-1]):
+                blocks.append(_make_block(run, source))
+                run = []
+            run.append(c)
+        blocks.append(_make_block(run, source))
+    blocks.sort(key=lambda b: b.rank)
+
+    # 4. Ins Budget packen; passt ein zusammengeführter Block nicht mehr, wird er
+    #    auf die längste passende Folge um seinen besten Chunk gekürzt (notfalls
+    #    wird der beste Chunk an einer Zeilengrenze abgeschnitten)
+    packed, used = [], 0
+    for block in blocks:
+        budget = token_budget - used
+        if _cost(block) > budget:
+            if budget - estimate_tokens(block.label) - 1 < 50:
+                continue
+            block = _trim(block, budget)
+        if _cost(block) > budget:
+            cut = block.text[:(budget - estimate_tokens(block.label) - 1) * CHARS_PER_TOKEN]
+            block.text = cut[:cut.rfind("\n")] if "\n" in cut else cut
+        packed.append(block)
+        used += _cost(block)
+
+    # 5. Restbudget mit Treffern füllen, die MMR nicht gewählt oder das Kürzen
+    #    verworfen hat – beste zuerst, nur wenn sie ganz passen
+    taken = {cid for b in packed for cid in b.chunk_ids}
+    filled = 0
+    for c in unique:
+        if token_budget - used < 50:
+            break
+        if c["id"] in taken:
+            continue
+        block = _make_block([c], _source(c["meta"]))
+        if _cost(block) <= token_budget - used:
+            packed.append(block)
+            taken.add(c["id"])
+            used += _cost(block)
+            filled += 1
+    packed.sort(key=lambda b: b.rank)
+
+    stats["nachgefuellt"] = filled
+    stats["bloecke"] = len(packed)
+    stats["chunks"] = sum(len(b.chunk_ids) for b in packed)
+    stats["tokens_nachher"] = used
+    return packed, stats
+
+
+def _adjacent(a, b) -> bool:
+    ia, ib = a["meta"].get("chunk_index"), b["meta"].get("chunk_index")
+    return (ia is not None and ib is not None and abs(ia - ib) == 1
+            and _source(a["meta"]) == _source(b["meta"]))
+
+
+def format_context(blocks) -> str:
+    """Kontext für den Prompt: ein Abschnitt pro Block mit Quellenangabe."""
+    return "\n\n".join(f"[{b.label}]\n{b.text}" for b in blocks)
@@ -0,0 +1,253 @@
+# ================================
+# Einlesen und Chunken von Dokumenten
+#
+# Eigenes Modul, damit die Worker-Prozesse beim parallelen Parsen nur die
+# Parser importieren und nicht die Chroma-Initialisierung aus request.py.
+# ================================
+
+import hashlib
+import os
+import time
+from bisect import bisect_right
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+import metrics
+
+PARSE_WORKERS = max(1, (os.cpu_count() or 2) - 1)   # Worker-Prozesse fürs Parsen
+PARSE_TIMEOUT = 120                                  # Sekunden pro Datei, danach Abbruch
+CHUNK_ID_SCHEME = "sha256"                           # Im Manifest vermerkt; ändert es sich, wird neu indexiert
+
+
+def chunk_id(text: str) -> str:
+    """Inhaltsbasierte Chunk-ID: gleicher Text ergibt in jeder Datei dieselbe ID,
+    sodass doppelte Passagen nur einmal eingebettet und gespeichert werden."""
+    return "chunk_" + hashlib.sha256(text.encode("utf-8")).hexdigest()[:32]
+
+
+def split_code_text(text: str, size: int = 500, overlap: int = 100):
+    """Teilt Code in sinnvolle, überlappende Chunks, ohne mitten in Zeilen zu schneiden."""
+    lines = text.splitlines()
+    chunks = []
+    current_chunk = []
+    current_length = 0
+
+    for line in lines:
+        line = line.rstrip()  # Einrückung bleibt erhalten
+        line_len = len(line) + 1  # +1 für Zeilenumbruch
+        # Prüfen, ob Zeile noch in den aktuellen Chunk passt
+        if current_length + line_len > size and current_chunk:
+            chunks.append("\n".join(current_chunk))
+            # Überlappung: letzte N Zeilen des vorherigen Chunks übernehmen
+            overlap_lines = max(1, int(overlap / (line_len or 1)))
+            current_chunk = current_chunk[-overlap_lines:]
+            current_length = sum(len(l) + 1 for l in current_chunk)
+        current_chunk.append(line)
+        current_length += line_len
+
+    # Rest anhängen
+    if current_chunk:
+        chunks.append("\n".join(current_chunk))
+
+    # Leere oder sehr kurze Chunks rausfiltern
+    cleaned = [c.strip() for c in chunks if len(c.strip()) > 10]
+    return cleaned
+
+
+def process_code(file_path: str, chunk_size: int = 500, overlap: int = 100):
+    """Liest Code-Dateien ein, chunkt sie intelligent und erstellt Metadaten."""
+    docs, ids, metas = [], [], []
+    filename = os.path.basename(file_path)
+
+    try:
+        with metrics.span("code_read") as s, open(file_path, "r", encoding="utf-8", errors="ignore") as f:
+            text = f.read().strip()
+            s.add(bytes=len(text))
+
+        if not text:
+            print(f"Datei {filename} ist leer oder konnte nicht gelesen werden")
+            return docs, ids, metas
+
+        with metrics.span("chunking", bytes=len(text)) as s:
+            chunks = split_code_text(text, size=chunk_size, overlap=overlap)
+            s.add(chunks=len(chunks))
+
+        for j, chunk in enumerate(chunks):
+            docs.append(chunk)
+            ids.append(chunk_id(chunk))
+            metas.append({
+                "filename": filename,
+                "chunk_index": j,
+                "path": file_path,
+                "type": "code",
+                "lines": len(chunk.splitlines())
+            })
+
+        print(f"{len(chunks)} Chunks aus {filename} erzeugt.")
+    except Exception as e:
+        print(f"Fehler beim Verarbeiten von {filename}: {e}")
+
+    return docs, ids, metas
+
+
+def process_pdf(path, chunk_size=500, overlap=100):
+    """Liest eine PDF vollständig ein, chunked seitenübergreifend und behält Seiteninfos."""
+    # Schwere Abhängigkeiten erst laden, wenn wirklich eine PDF geparst wird
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+    from PyPDF2 import PdfReader
+
+    # 1. Seitentexte + Startposition jeder Seite erfassen (ein einziges join statt +=)
+    page_texts = []
+    page_starts = []  # Startzeichen jeder Seite im Gesamttext, aufsteigend sortiert
+    char_index = 0
+    with metrics.span("pdf_extract", bytes=os.path.getsize(path)) as s:
+        reader = PdfReader(path)
+        for page in reader.pages:
+            text = page.extract_text() or ""
+            page_starts.append(char_index)
+            page_texts.append(text)
+            char_index += len(text) + 1
+        full_text = "".join(text + "\n" for text in page_texts)
+        s.add(pages=len(page_texts), chars=len(full_text))
+
+    # 2. Mit RecursiveCharacterTextSplitter aufteilen; add_start_index liefert
+    #    die Position jedes Chunks direkt beim Splitten (auch bei doppelten Passagen)
+    splitter = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=overlap,
+        length_function=len,
+        separators=["\n\n", "\n", ".", " ", ""],
+        add_start_index=True
+    )
+    with metrics.span("chunking", bytes=len(full_text)) as s:
+        chunks = splitter.create_documents([full_text])
+        s.add(chunks=len(chunks))
+
+    # 3. IDs, Metadaten und Dokumente erzeugen
+    docs, ids, metadatas = [], [], []
+    base_name = os.path.basename(path)
+
+    for idx, chunk in enumerate(chunks):
+        text = chunk.page_content
+        # Zugehörige Seiten per Binärsuche über die Seitenanfänge: O(log p) pro Chunk
+        start_char = max(chunk.metadata.get("start_index", 0), 0)
+        end_char = start_char + max(len(text) - 1, 0)
+        first_page = bisect_right(page_starts, start_char)
+        last_page = bisect_right(page_starts, end_char)
+        page_info = f"{first_page}-{last_page}" if last_page > first_page else str(first_page)
+
+        docs.append(text)
+        ids.append(chunk_id(text))
+        metadatas.append({
+            "source": base_name,
+            "pages": page_info,
+            "path": path,
+            "chunk_index": idx
+        })
+
+    print(f"{len(chunks)} Chunks aus {base_name} erzeugt.")
+    return docs, ids, metadatas
+
+
+def parse_file(path: str, kind: str, chunk_size: int = 500, overlap: int = 100):
+    """Parst eine Datei je nach Art als PDF oder Code."""
+    if kind == "pdf":
+        return process_pdf(path, chunk_size, overlap)
+    return process_code(path, chunk_size, overlap)
+
+
+def _parse_file_with_metrics(path: str, kind: str, chunk_size: int, overlap: int):
+    """parse_file im Worker-Prozess; liefert zusätzlich die dort gemessenen Spans."""
+    metrics.drain()   # beim Fork geerbte Spans des Hauptprozesses verwerfen
+    result = parse_file(path, kind, chunk_size, overlap)
+    return result, metrics.drain()
+
+
+def _shutdown_pool(pool):
+    """Beendet den Pool sofort, auch wenn Worker noch an einer Datei hängen."""
+    for proc in list((getattr(pool, "_processes", None) or {}).values()):
+        if proc.is_alive():
+            proc.terminate()
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def parse_files_parallel(tasks, workers: int = PARSE_WORKERS, timeout: float = PARSE_TIMEOUT,
+                         chunk_size: int = 500, overlap: int = 100):
+    """Parst Dateien parallel in einem Prozess-Pool.
+
+    tasks ist ein (auch lazy erzeugter) Iterator über (Pfad, Art); neue Dateien
+    werden erst gezogen, wenn ein Worker frei ist. Liefert (Pfad, Art, Ergebnis,
+    Fehler), sobald eine Datei fertig ist; Ergebnis ist (docs, ids, metas) oder None.
+    Braucht eine Datei länger als timeout Sekunden, wird sie als fehlgeschlagen
+    gemeldet und der Pool neu gestartet – hängende Worker lassen sich nur so
+    beenden. Die übrigen laufenden Dateien werden dabei erneut eingeplant.
+    Stürzt ein Worker ab (BrokenProcessPool), scheitern alle gleichzeitig
+    laufenden Dateien; welche schuld war, ist unklar. Sie werden deshalb
+    einzeln wiederholt und erst als fehlgeschlagen gemeldet, wenn der Pool
+    auch mit ihnen allein abstürzt.
+    Auch mit einem Worker wird im Pool geparst, sonst gäbe es keinen Timeout."""
+    tasks = iter(tasks)
+    workers = max(1, workers)
+
+    retry = deque()     # nach einem Pool-Neustart erneut einzuplanende Dateien
+    suspects = deque()  # Dateien aus einem abgestürzten Pool, laufen einzeln
+    pool = ProcessPoolExecutor(max_workers=workers)
+    running = {}        # Future -> (Pfad, Art, Startzeit, allein)
+
+    def next_task():
+        if retry:
+            return retry.popleft()
+        return next(tasks, None)
+
+    def submit(path, kind, alone=False):
+        fut = pool.submit(_parse_file_with_metrics, path, kind, chunk_size, overlap)
+        running[fut] = (path, kind, time.monotonic(), alone)
+
+    try:
+        while True:
+            # Verdächtige Dateien allein einplanen, sonst nur so viele Dateien
+            # wie Worker frei sind, damit die Startzeit stimmt
+            if suspects:
+                if not running:
+                    submit(*suspects.popleft(), alone=True)
+            elif not any(alone for *_, alone in running.values()):
+                while len(running) < workers:
+                    task = next_task()
+                    if task is None:
+                        break
+                    submit(*task)
+
+            if not running:
+                break
+
+            done, _ = wait(running, timeout=1.0, return_when=FIRST_COMPLETED)
+            broken = False
+            for fut in done:
+                path, kind, _, alone = running.pop(fut)
+                try:
+                    result, spans = fut.result()
+                    metrics.merge(spans)
+                    yield path, kind, result, None
+                except BrokenProcessPool as e:
+                    broken = True
+                    if alone:
+                        yield path, kind, None, e
+                    else:
+                        suspects.append((path, kind))
+                except Exception as e:
+                    yield path, kind, None, e
+
+            now = time.monotonic()
+            overdue = [f for f, (_, _, started, _) in running.items() if now - started > timeout]
+            for fut in overdue:
+                path, kind, *_ = running.pop(fut)
+                yield path, kind, None, TimeoutError(f"Parsen dauerte länger als {timeout}s")
+
+            if overdue or broken:
+                # Ist der Pool abgestürzt, scheitern auch die noch laufenden Dateien
+                (suspects if broken else retry).extend((p, k) for p, k, *_ in running.values())
+                running.clear()
+                _shutdown_pool(pool)
+                pool = ProcessPoolExecutor(max_workers=workers)
+    finally:
+        _shutdown_pool(pool)
@@ -0,0 +1,111 @@
+# ================================
+# Persistenter Embedding-Cache
+#
+# Schlüssel ist (Embedding-Modell, SHA-256 des Chunk-Texts) – unabhängig von
+# Dateiname, Pfad oder Chunk-Index. Umbenennen, Verschieben oder Neu-Chunken
+# von Dateien kostet dadurch für bereits bekannte Texte keine GPU-Zeit.
+# ================================
+
+import hashlib
+import sqlite3
+import threading
+import time
+from array import array
+from pathlib import Path
+
+
+def text_key(text: str) -> str:
+    """SHA-256 eines Chunk-Texts als Cache-Schlüssel."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """SQLite-Cache für Embeddings mit Treffer-Zählern und LRU-Verdrängung."""
+
+    def __init__(self, path, max_entries: int = 200_000):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model     TEXT NOT NULL,
+                hash      TEXT NOT NULL,
+                vector    BLOB NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (model, hash)
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_last_used ON embeddings(last_used)")
+        self.conn.commit()
+
+    def get_many(self, model: str, texts):
+        """Liefert pro Text das gecachte Embedding oder None."""
+        keys = [text_key(t) for t in texts]
+        found = {}
+        with self._lock:
+            unique = list(dict.fromkeys(keys))
+            for i in range(0, len(unique), 500):
+                part = unique[i:i + 500]
+                rows = self.conn.execute(
+                    f"SELECT hash, vector FROM embeddings WHERE model = ? "
+                    f"AND hash IN ({','.join('?' * len(part))})",
+                    [model, *part]
+                )
+                for h, blob in rows:
+                    found[h] = array("f", blob).tolist()
+
+            if found:
+                now = time.time()
+                self.conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE model = ? AND hash = ?",
+                    [(now, model, h) for h in found]
+                )
+                self.conn.commit()
+
+            result = [found.get(k) for k in keys]
+            hits = sum(v is not None for v in result)
+            self.hits += hits
+            self.misses += len(result) - hits
+        return result
+
+    def put_many(self, model: str, texts, embeddings):
+        """Speichert Embeddings und verdrängt bei Bedarf die ältesten Einträge."""
+        now = time.time()
+        rows = [(model, text_key(t), array("f", e).tobytes(), now)
+                for t, e in zip(texts, embeddings)]
+        with self._lock:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, hash, vector, last_used) VALUES (?, ?, ?, ?)",
+                rows
+            )
+            self._evict()
+            self.conn.commit()
+
+    def _evict(self):
+        count = self.conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        overflow = count - self.max_entries
+        if overflow > 0:
+            self.conn.execute(
+                "DELETE FROM embeddings WHERE rowid IN "
+                "(SELECT rowid FROM embeddings ORDER BY last_used LIMIT ?)",
+                (overflow,)
+            )
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = self.conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        total = self.hits + self.misses
+        return {
+            "eintraege": entries,
+            "treffer": self.hits,
+            "fehltreffer": self.misses,
+            "trefferquote": round(self.hits / total, 3) if total else 0.0,
+        }
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
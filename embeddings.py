@@ -0,0 +1,306 @@
+# ================================
+# Embeddings über den lokalen Ollama-Server
+#
+# Alle Requests laufen über einen gemeinsamen Client mit Verbindungspool
+# (Keep-Alive), Timeouts und Wiederholungen mit Backoff. Große Mengen an
+# Chunks werden in Batches aufgeteilt und mit einer begrenzten Anzahl
+# paralleler Requests eingebettet; scheitert ein Batch endgültig, kostet
+# das nur diesen Batch und nicht den ganzen Lauf.
+# Bereits bekannte Texte kommen aus dem persistenten Embedding-Cache.
+# Gespeichert und gesucht wird mit auf EMBED_DIM gekürzten, L2-normierten
+# Vektoren (Matryoshka); der Cache hält die vollen Vektoren des Modells.
+# Im Server-Betrieb bündelt der QueryBatcher gleichzeitig gestellte Fragen
+# mehrerer Nutzer zu einem gemeinsamen /api/embed-Request.
+# ================================
+
+import asyncio
+import math
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
+import requests
+from requests.adapters import HTTPAdapter
+import metrics
+
+# Wie beim ollama-Paket: OLLAMA_HOST überschreibt den lokalen Standard-Server
+OLLAMA_HOST = os.getenv("OLLAMA_HOST", "localhost:11434")
+EMBED_URL = ("" if "://" in OLLAMA_HOST else "http://") + OLLAMA_HOST.rstrip("/") + "/api/embed"
+EMBED_MODEL = "nomic-embed-text"
+# nomic-embed-text (v1.5) ist auf 768, 512, 256, 128 und 64 Dimensionen trainiert
+EMBED_DIM = int(os.getenv("RAG_EMBED_DIM", "256"))
+EMBED_BATCH_SIZE = 64       # Chunks pro /api/embed-Request
+EMBED_WORKERS = 4           # Maximal gleichzeitige Requests
+EMBED_RETRIES = 3           # Wiederholungen pro Request
+EMBED_CONNECT_TIMEOUT = 3   # Sekunden bis die Verbindung steht
+EMBED_READ_TIMEOUT = 120    # Sekunden für die Antwort (großer Batch bei kaltem Modell)
+EMBED_KEEP_ALIVE = "30m"    # So lange hält Ollama das Embedding-Modell geladen
+QUERY_BATCH_WINDOW = 0.005  # Sekunden, die der QueryBatcher auf weitere Fragen wartet
+
+_cache = None               # Optionaler EmbeddingCache, siehe set_embedding_cache()
+_batcher = None             # Optionaler QueryBatcher, siehe set_query_batcher()
+
+
+def set_embedding_cache(cache):
+    """Aktiviert einen persistenten Embedding-Cache (oder None zum Deaktivieren)."""
+    global _cache
+    _cache = cache
+
+
+def get_embedding_cache():
+    return _cache
+
+
+class EmbeddingError(RuntimeError):
+    """Ein Embedding-Request ist auch nach allen Wiederholungen fehlgeschlagen."""
+
+
+class EmbeddingClient:
+    """Gemeinsamer HTTP-Client für /api/embed.
+
+    Nutzt eine Session mit Verbindungspool, damit nicht jeder Aufruf eine neue
+    TCP-Verbindung aufbaut, setzt Timeouts und wiederholt vorübergehende Fehler
+    mit exponentiellem Backoff. Über keep_alive bleibt das Modell zwischen
+    Indexier-Batches und Fragen im Speicher."""
+
+    def __init__(self, url=EMBED_URL, keep_alive=EMBED_KEEP_ALIVE, retries=EMBED_RETRIES,
+                 timeout=(EMBED_CONNECT_TIMEOUT, EMBED_READ_TIMEOUT), backoff=0.5,
+                 pool_size=EMBED_WORKERS * 2):
+        self.url = url
+        self.keep_alive = keep_alive
+        self.retries = retries
+        self.timeout = timeout
+        self.backoff = backoff
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def embed(self, texts, model=EMBED_MODEL):
+        """Bettet Texte ein. Wirft EmbeddingError statt eine leere Liste zu liefern."""
+        texts = list(texts)
+        payload = {"model": model, "input": texts, "keep_alive": self.keep_alive}
+        last_error = None
+
+        for attempt in range(self.retries + 1):
+            try:
+                with metrics.span("embedding_request", texts=len(texts), bytes=sum(len(t) for t in texts)):
+                    response = self.session.post(self.url, json=payload, timeout=self.timeout)
+                response.raise_for_status()
+                embeddings = response.json().get("embeddings") or []
+                if len(embeddings) != len(texts):
+                    raise EmbeddingError(f"{len(embeddings)} statt {len(texts)} Embeddings erhalten")
+                return embeddings
+            except (requests.RequestException, ValueError, EmbeddingError) as e:
+                last_error = e
+                # Client-Fehler (z. B. unbekanntes Modell) sind nicht vorübergehend
+                status = getattr(getattr(e, "response", None), "status_code", None)
+                if status is not None and 400 <= status < 500 and status != 429:
+                    break
+                if attempt < self.retries:
+                    time.sleep(self.backoff * 2 ** attempt)
+
+        raise EmbeddingError(f"Embedding-Request fehlgeschlagen: {last_error}") from last_error
+
+    async def aembed(self, texts, model=EMBED_MODEL):
+        """Asynchrone Variante für nebenläufige Aufrufer (gleicher Verbindungspool)."""
+        return await asyncio.to_thread(self.embed, texts, model)
+
+    def close(self):
+        self.session.close()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_embedding_client() -> EmbeddingClient:
+    """Liefert den gemeinsamen EmbeddingClient (wird beim ersten Aufruf erzeugt)."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = EmbeddingClient()
+        return _client
+
+
+def truncate_embeddings(vectors, dim=EMBED_DIM):
+    """Kürzt Embeddings auf dim Dimensionen und normiert sie auf Länge 1.
+
+    Wie von nomic für Matryoshka vorgesehen: erst über den vollen Vektor
+    zentrieren (layer_norm; die Skalierung entfällt durch die Normierung),
+    dann kürzen, dann L2-normieren. Mit normierten Vektoren sind L2-Abstand
+    und Kosinus-Ähnlichkeit gleichwertig."""
+    result = []
+    for vector in vectors:
+        if len(vector) < dim:
+            raise EmbeddingError(f"Modell liefert {len(vector)} Dimensionen, konfiguriert sind {dim}")
+        mean = sum(vector) / len(vector)
+        head = [x - mean for x in vector[:dim]]
+        norm = math.sqrt(sum(x * x for x in head)) or 1.0
+        result.append([x / norm for x in head])
+    return result
+
+
+def get_local_embeddings(texts, model=EMBED_MODEL, dim=EMBED_DIM):
+    """Holt Embeddings (gekürzt auf dim, normiert) – zuerst aus dem Cache, nur
+    Fehltreffer vom Ollama-Server. Wirft EmbeddingError, wenn der Server nicht liefert."""
+    texts = list(texts)
+    if not texts:
+        return []
+    with metrics.span("embedding", texts=len(texts)) as span:
+        if _cache is None:
+            return truncate_embeddings(get_embedding_client().embed(texts, model), dim)
+
+        result = _cache.get_many(model, texts)
+        missing = [i for i, e in enumerate(result) if e is None]
+        span.add(cache_treffer=len(texts) - len(missing))
+        if missing:
+            # Doppelte Texte nur einmal anfragen
+            unique_texts = list(dict.fromkeys(texts[i] for i in missing))
+            fetched = get_embedding_client().embed(unique_texts, model)
+
+            _cache.put_many(model, unique_texts, fetched)
+            by_text = dict(zip(unique_texts, fetched))
+            for i in missing:
+                result[i] = by_text[texts[i]]
+        return truncate_embeddings(result, dim)
+
+
+async def aget_local_embeddings(texts, model=EMBED_MODEL):
+    """Asynchrone Variante von get_local_embeddings für nebenläufige Aufrufer."""
+    return await asyncio.to_thread(get_local_embeddings, texts, model)
+
+
+class QueryBatcher:
+    """Bündelt einzelne Embedding-Anfragen aus mehreren Threads.
+
+    Die erste Anfrage öffnet ein Zeitfenster von window Sekunden; alles, was
+    bis dahin (oder bis max_batch) eintrifft, geht als ein /api/embed-Request
+    raus. Bei einem einzelnen Nutzer kostet das nur das kurze Fenster, unter
+    Last sinkt die Zahl der Requests und Ollama rechnet die Fragen gemeinsam."""
+
+    def __init__(self, window=QUERY_BATCH_WINDOW, max_batch=EMBED_BATCH_SIZE, workers=EMBED_WORKERS):
+        self.window = window
+        self.max_batch = max_batch
+        self.batches = 0
+        self.texts = 0
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="embed-batch")
+        self._thread = threading.Thread(target=self._collect, name="embed-batcher", daemon=True)
+        self._thread.start()
+
+    def embed(self, text: str, model=EMBED_MODEL):
+        """Liefert das Embedding eines Texts, sobald sein Batch fertig ist (wirft EmbeddingError)."""
+        future = Future()
+        self._queue.put((text, model, future))
+        return future.result()
+
+    def _collect(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._pool.submit(self._flush, batch)
+                    return
+                batch.append(item)
+            self._pool.submit(self._flush, batch)
+
+    def _flush(self, batch):
+        by_model = {}
+        for text, model, future in batch:
+            by_model.setdefault(model, []).append((text, future))
+        with self._lock:
+            self.batches += len(by_model)
+            self.texts += len(batch)
+
+        for model, items in by_model.items():
+            try:
+                with metrics.span("embedding_batch", texts=len(items)):
+                    embeddings = get_local_embeddings([text for text, _ in items], model)
+            except Exception as e:
+                for _, future in items:
+                    future.set_exception(e)
+                continue
+            for (_, future), embedding in zip(items, embeddings):
+                future.set_result(embedding)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"batches": self.batches, "texte": self.texts,
+                    "texte_pro_batch": round(self.texts / self.batches, 2) if self.batches else 0.0}
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+        self._pool.shutdown(wait=True)
+
+
+def set_query_batcher(batcher):
+    """Leitet Frage-Embeddings über einen QueryBatcher (oder None für direkte Requests)."""
+    global _batcher
+    _batcher = batcher
+
+
+def get_query_batcher():
+    return _batcher
+
+
+def embed_query(text: str, model=EMBED_MODEL):
+    """Embedding einer einzelnen Frage – gebündelt, wenn ein QueryBatcher aktiv ist."""
+    if _batcher is None:
+        return get_local_embeddings([text], model)[0]
+    return _batcher.embed(text, model)
+
+
+def _embed_batch(texts, model):
+    """Bettet einen Batch ein; gibt None zurück, wenn er endgültig scheitert."""
+    try:
+        return get_local_embeddings(texts, model=model)
+    except EmbeddingError as e:
+        print(f"Fehler beim lokalen Embedding-Request: {e}")
+        return None
+
+
+def embed_batch_stream(batches, workers=EMBED_WORKERS, model=EMBED_MODEL):
+    """Bettet einen Strom von Batches parallel ein.
+
+    batches ist ein (auch unendlicher) Iterator über (payload, texte). Liefert
+    (payload, embeddings) in Fertigstellungsreihenfolge; embeddings ist None,
+    wenn der Batch endgültig scheitert. Neue Batches werden erst gezogen, wenn
+    Platz frei ist – es sind nie mehr als 2 * workers Batches unterwegs, damit
+    der Speicherbedarf auch bei großen Korpora begrenzt bleibt."""
+    batches = iter(batches)
+    max_pending = max(1, workers) * 2
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        pending = {}
+
+        def submit_next():
+            for payload, texts in batches:
+                fut = pool.submit(_embed_batch, texts, model)
+                pending[fut] = payload
+                return True
+            return False
+
+        while len(pending) < max_pending and submit_next():
+            pass
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                payload = pending.pop(fut)
+                yield payload, fut.result()
+                submit_next()
@@ -0,0 +1,181 @@
+# ================================
+# Dateisystem-Watcher für die Live-Indexierung
+#
+# Beobachtet Ordner im Hintergrund und meldet neue, geänderte und gelöschte
+# Dateien gebündelt an einen Callback. Nutzt watchdog (inotify unter Linux,
+# ReadDirectoryChangesW unter Windows, FSEvents unter macOS), wenn es
+# installiert ist, sonst regelmäßiges Abtasten von mtime und Größe.
+# Ereignisse werden entprellt: gesammelte Änderungen werden erst verarbeitet,
+# wenn debounce Sekunden lang nichts mehr passiert ist (spätestens nach
+# max_delay) – ein Editor, der beim Speichern mehrfach schreibt, oder ein
+# git checkout lösen so nur einen Lauf aus.
+# ================================
+
+import os
+import threading
+import time
+
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:     # Ohne watchdog wird abgetastet
+    Observer = None
+    FileSystemEventHandler = object
+
+
+class _EventHandler(FileSystemEventHandler):
+    """Leitet watchdog-Ereignisse (auch beide Pfade einer Umbenennung) an den Watcher weiter."""
+
+    def __init__(self, watcher):
+        self.watcher = watcher
+
+    def on_any_event(self, event):
+        if event.event_type in ("opened", "closed_no_write"):
+            return
+        # Ein Ordner gilt bei jeder neuen Datei darin als geändert – die Datei
+        # selbst kommt als eigenes Ereignis
+        if event.is_directory and event.event_type == "modified":
+            return
+        for path in (event.src_path, getattr(event, "dest_path", "")):
+            if path:
+                self.watcher.notify(os.fsdecode(path), is_dir=event.is_directory)
+
+
+class FileWatcher:
+    """Sammelt Dateiänderungen unterhalb von folders und ruft on_change(pfade)
+    in einem eigenen Thread auf, sobald debounce Sekunden lang Ruhe war.
+
+    Die Pfade können auch Ordner sein (z. B. wenn ein ganzer Ordner gelöscht
+    oder verschoben wurde); on_change muss sie selbst auflösen."""
+
+    def __init__(self, folders, on_change, extensions=None, debounce: float = 1.0,
+                 max_delay: float = None, poll_interval: float = 2.0, force_polling: bool = False):
+        self.folders = [f for f in folders if os.path.isdir(f)]
+        self.on_change = on_change
+        self.extensions = tuple(e.lower() for e in extensions) if extensions else None
+        self.debounce = debounce
+        self.max_delay = max_delay if max_delay is not None else 10 * debounce
+        self.poll_interval = poll_interval
+        self.mode = "polling" if force_polling or Observer is None else "watchdog"
+        self._pending = {}              # Pfad → Zeitpunkt des letzten Ereignisses
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._threads = []
+        self._observer = None
+        self.busy = False
+        self.runs = 0
+        self.files = 0
+        self.last_run = None
+        self.last_error = None
+
+    def _matches(self, path: str) -> bool:
+        return self.extensions is None or path.lower().endswith(self.extensions)
+
+    def notify(self, path: str, is_dir: bool = False):
+        """Merkt eine geänderte Datei (oder einen Ordner) vor."""
+        if not is_dir and not self._matches(path):
+            return
+        with self._cond:
+            self._pending[path] = time.monotonic()
+            self._cond.notify()
+
+    def start(self):
+        if self._threads:
+            return self
+        self._stop.clear()
+        if self.mode == "watchdog":
+            self._observer = Observer()
+            handler = _EventHandler(self)
+            for folder in self.folders:
+                self._observer.schedule(handler, folder, recursive=True)
+            self._observer.start()
+        else:
+            self._threads.append(threading.Thread(target=self._poll, name="watcher-poll", daemon=True))
+        self._threads.append(threading.Thread(target=self._run, name="watcher", daemon=True))
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+            self._observer = None
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    @property
+    def running(self) -> bool:
+        return bool(self._threads)
+
+    def _snapshot(self) -> dict:
+        """Pfad → (mtime, Größe) aller passenden Dateien (Polling-Modus)."""
+        files = {}
+        for folder in self.folders:
+            for root, _, names in os.walk(folder):
+                for name in names:
+                    path = os.path.join(root, name)
+                    if not self._matches(path):
+                        continue
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    files[path] = (stat.st_mtime_ns, stat.st_size)
+        return files
+
+    def _poll(self):
+        before = self._snapshot()
+        while not self._stop.wait(self.poll_interval):
+            after = self._snapshot()
+            for path in before.keys() | after.keys():
+                if before.get(path) != after.get(path):
+                    self.notify(path)
+            before = after
+
+    def _take_ready(self):
+        """Wartet, bis seit debounce Sekunden keine Änderung mehr kam (oder die
+        älteste max_delay Sekunden wartet), und entnimmt alle gesammelten Pfade."""
+        with self._cond:
+            while not self._stop.is_set():
+                if not self._pending:
+                    self._cond.wait()
+                    continue
+                now = time.monotonic()
+                quiet = self.debounce - (now - max(self._pending.values()))
+                overdue = self.max_delay - (now - min(self._pending.values()))
+                if quiet <= 0 or overdue <= 0:
+                    paths = list(self._pending)
+                    self._pending.clear()
+                    self.busy = True
+                    return paths
+                self._cond.wait(min(quiet, overdue))
+            return None
+
+    def _run(self):
+        while True:
+            paths = self._take_ready()
+            if paths is None:
+                return
+            try:
+                self.on_change(sorted(paths))
+                self.last_error = None
+            except Exception as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+                print(f"[Watcher] Fehler beim Aktualisieren: {self.last_error}")
+            finally:
+                self.busy = False
+                self.runs += 1
+                self.files += len(paths)
+                self.last_run = time.strftime("%H:%M:%S")
+
+    def status(self) -> dict:
+        with self._cond:
+            queued = len(self._pending)
+        return {"aktiv": self.running, "modus": self.mode, "warteschlange": queued,
+                "laeuft": self.busy, "durchlaeufe": self.runs, "dateien": self.files,
+                "letzter_lauf": self.last_run, "fehler": self.last_error}
@@ -0,0 +1,145 @@
+# ================================
+# Persistenter Cache für GitHub-API-Antworten
+#
+# Jede Antwort wird mit ETag gespeichert und gilt je nach Endpoint eine
+# bestimmte Zeit als frisch. Danach wird per If-None-Match nachgefragt –
+# eine 304-Antwort zählt nicht gegen das Rate-Limit. Wird das verbleibende
+# Kontingent knapp (oder ist es erschöpft), werden veraltete Daten geliefert.
+# ================================
+
+import json
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+# Frische-Dauer in Sekunden pro Endpoint (erster passender Eintrag gewinnt)
+DEFAULT_TTLS = [
+    (r"^/repos/[^/]+/[^/]+/commits$", 60),
+    (r"^/repos/[^/]+/[^/]+/issues$", 120),
+    (r"^/repos/[^/]+/[^/]+$", 300),
+    (r"^/users?(/[^/]+)?/repos$", 300),
+    (r".*", 60),
+]
+
+
+class GitHubResponseCache:
+    """SQLite-Cache mit ETag-Revalidierung, Rate-Limit-Schutz und Statistiken."""
+
+    def __init__(self, path, ttls=DEFAULT_TTLS, rate_limit_reserve: int = 100):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.ttls = [(re.compile(pattern), ttl) for pattern, ttl in ttls]
+        self.rate_limit_reserve = rate_limit_reserve
+        self.rate_remaining = None   # Letzter bekannter Wert von X-RateLimit-Remaining
+        self.rate_reset = 0          # Zeitpunkt (epoch), an dem das Kontingent zurückgesetzt wird
+        self._lock = threading.Lock()
+        self._stats = {kind: {"anzahl": 0, "zeit": 0.0}
+                       for kind in ("frisch", "revalidiert", "neu", "veraltet")}
+        self.conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key        TEXT PRIMARY KEY,
+                etag       TEXT,
+                link       TEXT,
+                data       TEXT NOT NULL,
+                fetched_at REAL NOT NULL
+            )
+        """)
+        self.conn.commit()
+
+    def _ttl(self, path: str):
+        for pattern, ttl in self.ttls:
+            if pattern.match(path):
+                return ttl
+        return 0
+
+    def _load(self, key):
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT etag, link, data, fetched_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {"etag": row[0], "link": row[1], "data": json.loads(row[2]), "fetched_at": row[3]}
+
+    def _store(self, key, etag, link, data):
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO responses (key, etag, link, data, fetched_at) VALUES (?, ?, ?, ?, ?)",
+                (key, etag, link, json.dumps(data), time.time())
+            )
+            self.conn.commit()
+
+    def _refresh(self, key):
+        with self._lock:
+            self.conn.execute("UPDATE responses SET fetched_at = ? WHERE key = ?", (time.time(), key))
+            self.conn.commit()
+
+    def _update_rate_limit(self, headers):
+        remaining = headers.get("x-ratelimit-remaining")
+        if remaining is not None:
+            self.rate_remaining = int(remaining)
+            self.rate_reset = int(headers.get("x-ratelimit-reset", 0))
+
+    def _budget_low(self):
+        if self.rate_remaining is None or time.time() >= self.rate_reset:
+            return False
+        return self.rate_remaining <= self.rate_limit_reserve
+
+    def _record(self, kind, started):
+        with self._lock:
+            self._stats[kind]["anzahl"] += 1
+            self._stats[kind]["zeit"] += time.perf_counter() - started
+
+    def get(self, path: str, params: dict, request):
+        """Liefert (headers, data) für einen GET-Request, wenn möglich aus dem Cache.
+
+        request(path, params, headers) führt den eigentlichen Request aus und
+        liefert (headers, data); data ist None bei einer 304-Antwort."""
+        started = time.perf_counter()
+        key = path + "?" + json.dumps(params or {}, sort_keys=True)
+        entry = self._load(key)
+
+        def cached(kind):
+            self._record(kind, started)
+            return {"link": entry["link"] or ""}, entry["data"]
+
+        if entry and time.time() - entry["fetched_at"] < self._ttl(path):
+            return cached("frisch")
+        if entry and self._budget_low():
+            return cached("veraltet")
+
+        headers = {"If-None-Match": entry["etag"]} if entry and entry["etag"] else {}
+        try:
+            resp_headers, data = request(path, params, headers)
+        except Exception as e:
+            # Rate-Limit erschöpft (GithubException 403/429) → lieber veraltete Daten als ein Fehler
+            if entry and getattr(e, "status", None) in (403, 429):
+                return cached("veraltet")
+            raise
+
+        self._update_rate_limit(resp_headers)
+        if data is None and entry:
+            self._refresh(key)
+            return cached("revalidiert")
+
+        self._store(key, resp_headers.get("etag"), resp_headers.get("link"), data)
+        self._record("neu", started)
+        return resp_headers, data
+
+    def stats(self) -> dict:
+        """Treffer pro Art mit mittlerer Latenz in Millisekunden und Rate-Limit-Stand."""
+        with self._lock:
+            result = {
+                kind: {"anzahl": s["anzahl"],
+                       "latenz_ms": round(1000 * s["zeit"] / s["anzahl"], 1) if s["anzahl"] else 0.0}
+                for kind, s in self._stats.items()
+            }
+        result["rate_limit_rest"] = self.rate_remaining
+        return result
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
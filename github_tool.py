@@ -1,137 +1,244 @@
+import contextvars
 import os
-from github import Github, GithubException
-from dotenv import load_dotenv
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from collections.abc import Iterator
+from functools import lru_cache
+from itertools import chain
 from datetime import datetime
+from pathlib import Path
+from github_cache import GitHubResponseCache
+import metrics
 
-load_dotenv()
-token = os.getenv("GITHUB_TOKEN")
+# Client, Token und Cache werden erst beim ersten Tool-Aufruf erzeugt, damit
+# der Import schnell bleibt und ohne GitHub-Token funktioniert.
+_gh = None
+_response_cache = None
+_init_lock = threading.Lock()
 
-if not token:
-    raise ValueError("Fehler: Kein GitHub-Token gefunden (.env prüfen).")
+# Unabhängige API-Aufrufe eines Tools laufen parallel
+_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="github")
+
+# Antworten werden mit ETag zwischengespeichert (304 zählt nicht gegen das Rate-Limit)
+CACHE_PATH = Path(os.getenv("GITHUB_CACHE_PATH", Path(__file__).with_name("github_cache.sqlite")))
+
+
+def get_github():
+    """Liefert den GitHub-Client; Token wird beim ersten Aufruf aus .env geladen."""
+    global _gh
+    with _init_lock:
+        if _gh is None:
+            from github import Github
+            from dotenv import load_dotenv
+
+            load_dotenv()
+            token = os.getenv("GITHUB_TOKEN")
+            if not token:
+                raise ValueError("Fehler: Kein GitHub-Token gefunden (.env prüfen).")
+            # GITHUB_API_URL z. B. für GitHub Enterprise oder den Fake-Server in benchmarks/
+            base_url = os.getenv("GITHUB_API_URL")
+            _gh = Github(token, base_url=base_url) if base_url else Github(token)
+        return _gh
+
+
+def get_response_cache():
+    global _response_cache
+    with _init_lock:
+        if _response_cache is None:
+            _response_cache = GitHubResponseCache(CACHE_PATH)
+        return _response_cache
+
+
+def _submit(fn, *args):
+    """Startet fn im Thread-Pool mit dem aktuellen Kontext (Metrik-Spans bleiben der Anfrage zugeordnet)."""
+    return _pool.submit(contextvars.copy_context().run, fn, *args)
+
+
+def _request(path: str, params: dict, headers: dict):
+    gh = get_github()
+    requester = getattr(gh, "requester", None) or gh._Github__requester
+    with metrics.span("github_api", endpoint=path, revalidierung=int(bool(headers))):
+        return requester.requestJsonAndCheck("GET", path, parameters=params, headers=headers)
+
+
+def _api_get(path: str, params: dict = None):
+    """GET auf die GitHub-REST-API (mit Token des Clients), über den Antwort-Cache.
+    Liefert (headers, data)."""
+    return get_response_cache().get(path, params, _request)
+
+
+def _error(e: Exception):
+    """Wandelt eine Exception in die Fehler-Rückgabe der Tools um."""
+    from github import GithubException
+
+    if isinstance(e, GithubException):
+        return {"fehler": f"GitHub-Fehler: {e.data.get('message', str(e))}"}
+    return {"fehler": f"Allgemeiner Fehler: {e}"}
+
+
+@lru_cache(maxsize=1)
+def _token_login():
+    """Login des Token-Users; wird nur einmal abgefragt."""
+    return get_github().get_user().login
+
+
+def _format_date(value: str):
+    """Wandelt einen ISO-Zeitstempel der API in das Anzeigeformat um."""
+    if not value:
+        return "?"
+    return datetime.strptime(value, "%Y-%m-%dT%H:%M:%SZ").strftime("%d.%m.%Y %H:%M:%S")
+
+
+def _count_commits(full_name: str):
+    """Zählt die Commits mit einer einzigen Seite der Größe 1: die Seitenzahl
+    im Link-Header (rel="last") entspricht der Gesamtzahl."""
+    headers, data = _api_get(f"/repos/{full_name}/commits", {"per_page": 1})
+    match = re.search(r'[?&]page=(\d+)>; rel="last"', headers.get("link", ""))
+    return int(match.group(1)) if match else len(data or [])
+
+
+def _commit_info(c: dict):
+    author = c["commit"].get("author") or {}
+    return {
+        "nachricht": c["commit"]["message"].split("\n")[0],
+        "autor": author.get("name", "Unbekannt"),
+        "datum": _format_date(author.get("date"))
+    }
 
-gh = Github(token)
 
 def get_repo_stats(repo_name: str, username: str):
     """Liefert allgemeine Informationen zu einem Repository, inklusive Commits."""
     try:
         # Falls kein User-Input, Token-User nutzen
         if username is None:
-            username = gh.get_user().login
+            username = _token_login()
 
-        repo = gh.get_repo(username +"/"+repo_name)
-        commits = list(repo.get_commits()[:2])  # nur die letzten 2
-        total_commits = repo.get_commits().totalCount
+        full_name = username + "/" + repo_name
+        # Repo, letzte Commits und Commit-Anzahl gleichzeitig abfragen
+        repo_f = _submit(_api_get, f"/repos/{full_name}")
+        commits_f = _submit(_api_get, f"/repos/{full_name}/commits", {"per_page": 2})
+        total_f = _submit(_count_commits, full_name)
 
-        last_commits = []
-        for c in commits:
-            last_commits.append({
-                "nachricht": c.commit.message.split("\n")[0],
-                "autor": c.commit.author.name if c.commit.author else "Unbekannt",
-                "datum": c.commit.author.date.strftime("%d.%m.%Y %H:%M:%S") if c.commit.author else "?"
-            })
+        _, repo = repo_f.result()
+        _, commits = commits_f.result()
 
         return {
-            "name": repo.full_name,
-            "beschreibung": repo.description,
-            "sterne": repo.stargazers_count,
-            "forks": repo.forks_count,
-            "issues_offen": repo.open_issues_count,
-            "sprache": repo.language,
-            "commits_gesamt": total_commits,
-            "letztes_update": repo.updated_at.strftime("%d.%m.%Y %H:%M:%S"),
-            "letzte_commits": last_commits
+            "name": repo["full_name"],
+            "beschreibung": repo["description"],
+            "sterne": repo["stargazers_count"],
+            "forks": repo["forks_count"],
+            "issues_offen": repo["open_issues_count"],
+            "sprache": repo["language"],
+            "commits_gesamt": total_f.result(),
+            "letztes_update": _format_date(repo["updated_at"]),
+            "letzte_commits": [_commit_info(c) for c in commits]
         }
 
-    except GithubException as e:
-        return {"fehler": f"GitHub-Fehler: {e.data.get('message', str(e))}"}
     except Exception as e:
-        return {"fehler": f"Allgemeiner Fehler: {e}"}
+        return _error(e)
 
 
 def get_last_commit(username: str, repo_name: str):
     """Gibt die Nachricht und das Datum des letzten Commits zurück."""
     try:
-        repo = gh.get_repo(username+"/"+repo_name)
-        commit = repo.get_commits()[0]
+        # Ein Request statt Repo + Commit-Liste
+        _, commits = _api_get(f"/repos/{username}/{repo_name}/commits", {"per_page": 1})
+        if not commits:
+            return {"fehler": "Keine Commits gefunden."}
+        commit = commits[0]["commit"]
+        author = commit.get("author") or {}
         return {
-            "nachricht": commit.commit.message,
-            "autor": commit.commit.author.name,
-            "datum": commit.commit.author.date.strftime("%d.%m.%Y %H:%M:%S")
+            "nachricht": commit["message"],
+            "autor": author.get("name", "Unbekannt"),
+            "datum": _format_date(author.get("date"))
         }
 
-    except GithubException as e:
-        return {"fehler": f"GitHub-Fehler: {e.data.get('message', str(e))}"}
     except Exception as e:
-        return {"fehler": f"Allgemeiner Fehler: {e}"}
+        return _error(e)
 
 
 def list_open_issues(username:str, repo_name: str):
     """Listet offene Issues auf (max. 5)."""
     try:
-        repo = gh.get_repo(username+"/"+repo_name)
-        issues = repo.get_issues(state="open")
+        # Nur die erste Seite mit 5 Einträgen laden
+        _, issues = _api_get(f"/repos/{username}/{repo_name}/issues", {"state": "open", "per_page": 5})
 
-        return [{"titel": i.title, "erstellt_von": i.user.login} for i in issues[:5]]
+        return [{"titel": i["title"], "erstellt_von": i["user"]["login"]} for i in issues[:5]]
 
-    except GithubException as e:
-        return {"fehler": f"GitHub-Fehler: {e.data.get('message', str(e))}"}
     except Exception as e:
-        return {"fehler": f"Allgemeiner Fehler: {e}"}
-
-
-def list_user_repos(username: str = None):
-    """Listet alle Repositories eines Users (sortiert nach letztem Update)."""
+        return _error(e)
+
+
+def iter_user_repos(username: str = None, limit: int = 10):
+    """Liefert die zuletzt aktualisierten Repositories eines Users lazy, Seite für Seite.
+
+    GitHub sortiert serverseitig nach Update-Zeit; es werden nur so viele Seiten
+    geladen, wie für limit Einträge nötig sind."""
+    path = f"/users/{username}/repos" if username else "/user/repos"
+    per_page = max(1, min(limit, 100))
+    page, delivered = 1, 0
+    while delivered < limit:
+        _, data = _api_get(path, {"sort": "updated", "direction": "desc",
+                                  "per_page": per_page, "page": page})
+        for repo in data:
+            yield {
+                "name": repo["name"],
+                "language": repo["language"] or "Unbekannt",
+                "stars": repo["stargazers_count"],
+                "forks": repo["forks_count"],
+                "visibility": "privat" if repo["private"] else "öffentlich",
+                "last_update": _format_date(repo["updated_at"]),
+            }
+            delivered += 1
+            if delivered >= limit:
+                return
+        if len(data) < per_page:
+            return
+        page += 1
+
+
+def list_user_repos(username: str = None, limit: int = 10):
+    """Listet die zuletzt aktualisierten Repositories eines Users (max. limit)."""
     try:
-        user = gh.get_user(username) if username else gh.get_user()
-        repos = list(user.get_repos())
-        repos = sorted(repos, key=lambda r: r.updated_at, reverse=True)
-
-        return [{
-            "name": repo.name,
-            "language": repo.language or "Unbekannt",
-            "stars": repo.stargazers_count,
-            "forks": repo.forks_count,
-            "visibility": "privat" if repo.private else "öffentlich",
-            "last_update": repo.updated_at.strftime("%d.%m.%Y %H:%M:%S"),
-        } for repo in repos]
-
-    except GithubException as e:
-        return {"fehler": f"GitHub-Fehler: {e.data.get('message', str(e))}"}
+        return list(iter_user_repos(username, int(limit)))
+
     except Exception as e:
-        return {"fehler": f"Allgemeiner Fehler: {e}"}
+        return _error(e)
 
 
 def format_result(data):
-    """Formatiert Rückgaben der GitHub-Tools für die Terminal-Ausgabe."""
+    """Formatiert Rückgaben der GitHub-Tools für die Terminal-Ausgabe.
+    Listen dürfen auch lazy sein (z. B. iter_user_repos) und werden zeilenweise gelesen."""
     if isinstance(data, dict):
         # Einzelnes Objekt (z. B. get_repo_stats)
         return "\n".join([f"{k.capitalize()}: {v}" for k, v in data.items()])
 
-    elif isinstance(data, list):
-        if not data:
+    elif isinstance(data, (list, Iterator)):
+        rows = iter(data)
+        first = next(rows, None)
+        if first is None:
             return "Keine Daten gefunden."
+        rows = chain([first], rows)
 
         # Prüfen, ob das Ergebnis aus list_user_repos stammt
-        if "letztes_update" in data[0]:
-            return "\n".join([
-                f"- {i['name']} | Sterne: {i['sterne']} | Forks: {i['forks']} | "
-                f"Sprache: {i['sprache']} | Letztes Update: {i['letztes_update']}"
-                for i in data
-            ])
+        if "last_update" in first:
+            return "\n".join(
+                f"- {i['name']} | Sterne: {i['stars']} | Forks: {i['forks']} | "
+                f"Sprache: {i['language']} | Letztes Update: {i['last_update']}"
+                for i in rows
+            )
 
         # Prüfen, ob es Issues sind
-        elif "titel" in data[0]:
-            return "\n".join([
+        elif "titel" in first:
+            return "\n".join(
                 f"- {i['titel']} (von {i['erstellt_von']})"
-                for i in data
-            ])
+                for i in rows
+            )
 
         # Fallback für unbekannte Listen
         else:
-            return "\n".join(map(str, data))
+            return "\n".join(map(str, rows))
 
     else:
         return str(data)
-
-
-
@@ -0,0 +1,177 @@
+# ================================
+# Index-Manifest für inkrementelles Indexieren
+#
+# Merkt sich pro Datei mtime, Größe, Inhalts-Hash und die erzeugten Chunk-IDs.
+# Damit können unveränderte Dateien vor dem Parsen übersprungen, geänderte
+# Dateien ersetzt und gelöschte Dateien aus der Collection entfernt werden.
+# Dazu kommt die Embedding-Konfiguration, mit der der Index erstellt wurde.
+# ================================
+
+import hashlib
+import json
+import sqlite3
+import threading
+from pathlib import Path
+
+
+def file_hash(path: str, block_size: int = 1 << 20) -> str:
+    """Berechnet den SHA-256 einer Datei blockweise (ohne sie komplett zu laden)."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+class IndexManifest:
+    """Persistentes Manifest (SQLite) mit einem Eintrag pro indexierter Datei.
+    Darf von mehreren Threads der Indexier-Pipeline gleichzeitig genutzt werden."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.RLock()
+        self.conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS files (
+                path      TEXT PRIMARY KEY,
+                kind      TEXT NOT NULL,
+                mtime_ns  INTEGER NOT NULL,
+                size      INTEGER NOT NULL,
+                hash      TEXT NOT NULL,
+                chunk_ids TEXT NOT NULL
+            )
+        """)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS refs (
+                path     TEXT NOT NULL,
+                position INTEGER NOT NULL,
+                chunk_id TEXT NOT NULL,
+                meta     TEXT NOT NULL,
+                PRIMARY KEY (path, position)
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_refs_chunk ON refs(chunk_id)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS info (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self.conn.commit()
+
+    def get_info(self) -> dict:
+        """Gespeicherte Index-Einstellungen (z. B. Embedding-Modell und -Dimension)."""
+        with self._lock:
+            return dict(self.conn.execute("SELECT key, value FROM info"))
+
+    def set_info(self, **values):
+        with self._lock:
+            self.conn.execute("DELETE FROM info")
+            self.conn.executemany("INSERT INTO info (key, value) VALUES (?, ?)",
+                                  [(k, str(v)) for k, v in values.items()])
+
+    def get(self, path: str):
+        """Liefert den Manifest-Eintrag einer Datei oder None."""
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT kind, mtime_ns, size, hash, chunk_ids FROM files WHERE path = ?",
+                (path,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            "kind": row[0],
+            "mtime_ns": row[1],
+            "size": row[2],
+            "hash": row[3],
+            "chunk_ids": json.loads(row[4]),
+        }
+
+    def is_unchanged(self, entry, stat) -> bool:
+        """Schneller Vergleich über mtime und Größe, ohne die Datei zu lesen."""
+        return (entry is not None
+                and entry["mtime_ns"] == stat.st_mtime_ns
+                and entry["size"] == stat.st_size)
+
+    def paths(self, kind: str = None):
+        """Alle bekannten Dateipfade (optional nur einer Art, z. B. 'pdf')."""
+        with self._lock:
+            if kind is None:
+                rows = self.conn.execute("SELECT path FROM files")
+            else:
+                rows = self.conn.execute("SELECT path FROM files WHERE kind = ?", (kind,))
+            return [r[0] for r in rows]
+
+    def update(self, path: str, kind: str, stat, digest: str, chunk_ids, metas=None):
+        """Speichert bzw. ersetzt den Eintrag einer Datei samt ihrer Fundstellen."""
+        chunk_ids = list(chunk_ids)
+        metas = metas or [{}] * len(chunk_ids)
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO files (path, kind, mtime_ns, size, hash, chunk_ids) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (path, kind, stat.st_mtime_ns, stat.st_size, digest, json.dumps(chunk_ids))
+            )
+            self.conn.execute("DELETE FROM refs WHERE path = ?", (path,))
+            self.conn.executemany(
+                "INSERT INTO refs (path, position, chunk_id, meta) VALUES (?, ?, ?, ?)",
+                [(path, i, cid, json.dumps(meta)) for i, (cid, meta) in enumerate(zip(chunk_ids, metas))]
+            )
+
+    def referenced(self, chunk_ids, exclude: str = None) -> set:
+        """Die Chunk-IDs, auf die noch mindestens eine Datei (außer exclude) verweist."""
+        chunk_ids = list(dict.fromkeys(chunk_ids))
+        found = set()
+        with self._lock:
+            for i in range(0, len(chunk_ids), 500):
+                part = chunk_ids[i:i + 500]
+                marks = ",".join("?" * len(part))
+                rows = self.conn.execute(
+                    f"SELECT DISTINCT chunk_id FROM refs WHERE chunk_id IN ({marks}) AND path IS NOT ?",
+                    (*part, exclude)
+                )
+                found.update(r[0] for r in rows)
+        return found
+
+    def sources(self, chunk_ids) -> dict:
+        """Chunk-ID → Metadaten aller Fundstellen (eine pro Datei, nach Pfad sortiert)."""
+        chunk_ids = list(dict.fromkeys(chunk_ids))
+        result = {}
+        with self._lock:
+            for i in range(0, len(chunk_ids), 500):
+                part = chunk_ids[i:i + 500]
+                marks = ",".join("?" * len(part))
+                rows = self.conn.execute(
+                    f"SELECT chunk_id, path, meta FROM refs WHERE chunk_id IN ({marks}) "
+                    f"ORDER BY chunk_id, path, position", part
+                )
+                seen = set()
+                for cid, path, meta in rows:
+                    if (cid, path) not in seen:
+                        seen.add((cid, path))
+                        result.setdefault(cid, []).append(json.loads(meta))
+        return result
+
+    def touch(self, path: str, stat):
+        """Aktualisiert nur mtime/Größe (Inhalt unverändert, z. B. nach Kopieren)."""
+        with self._lock:
+            self.conn.execute(
+                "UPDATE files SET mtime_ns = ?, size = ? WHERE path = ?",
+                (stat.st_mtime_ns, stat.st_size, path)
+            )
+
+    def remove(self, path: str):
+        with self._lock:
+            self.conn.execute("DELETE FROM files WHERE path = ?", (path,))
+            self.conn.execute("DELETE FROM refs WHERE path = ?", (path,))
+
+    def clear(self):
+        """Vergisst alle Dateien (alles wird beim nächsten Lauf neu indexiert)."""
+        with self._lock:
+            self.conn.execute("DELETE FROM files")
+            self.conn.execute("DELETE FROM refs")
+
+    def commit(self):
+        with self._lock:
+            self.conn.commit()
+
+    def close(self):
+        with self._lock:
+            self.conn.commit()
+            self.conn.close()
@@ -0,0 +1,146 @@
+# ================================
+# Lexikalischer Index (BM25) für die hybride Suche
+#
+# Invertierter Index in SQLite, der parallel zur Chroma-Collection
+# inkrementell gepflegt wird. Findet exakte Bezeichner, Funktionsnamen
+# und Fehlermeldungen, die eine reine Vektorsuche oft verfehlt.
+# ================================
+
+import math
+import re
+import sqlite3
+import threading
+from collections import Counter
+from pathlib import Path
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+_CAMEL_RE = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|\d+")
+
+
+def tokenize(text: str):
+    """Zerlegt Text in Suchbegriffe.
+
+    Bezeichner bleiben als Ganzes erhalten (z. B. 'get_repo_stats') und werden
+    zusätzlich in ihre Teile zerlegt ('get', 'repo', 'stats'; 'parseJson' →
+    'parse', 'json'), damit sowohl exakte als auch Teil-Treffer zählen."""
+    tokens = []
+    for word in _WORD_RE.findall(text):
+        lower = word.lower()
+        if len(lower) > 1:
+            tokens.append(lower)
+        parts = [p.lower() for piece in word.split("_") for p in _CAMEL_RE.findall(piece)]
+        if len(parts) > 1:
+            tokens.extend(p for p in parts if len(p) > 1 and p != lower)
+    return tokens
+
+
+class LexicalIndex:
+    """BM25 über einen invertierten Index, der pro Chunk-ID gepflegt wird."""
+
+    def __init__(self, path, k1: float = 1.2, b: float = 0.75):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS docs (
+                chunk_id TEXT PRIMARY KEY,
+                length   INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS postings (
+                term     TEXT NOT NULL,
+                chunk_id TEXT NOT NULL,
+                tf       INTEGER NOT NULL,
+                PRIMARY KEY (term, chunk_id)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS idx_postings_chunk ON postings(chunk_id);
+        """)
+        self.conn.commit()
+
+    def count(self) -> int:
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM docs").fetchone()[0]
+
+    def contains(self, chunk_ids):
+        """Liefert die Teilmenge der IDs, die bereits im Index sind."""
+        chunk_ids = list(chunk_ids)
+        found = set()
+        with self._lock:
+            for i in range(0, len(chunk_ids), 500):
+                part = chunk_ids[i:i + 500]
+                rows = self.conn.execute(
+                    f"SELECT chunk_id FROM docs WHERE chunk_id IN ({','.join('?' * len(part))})", part
+                )
+                found.update(r[0] for r in rows)
+        return found
+
+    def add(self, chunk_ids, docs):
+        """Nimmt Chunks auf (bestehende IDs werden ersetzt)."""
+        chunk_ids = list(chunk_ids)
+        with self._lock:
+            self._remove(chunk_ids)
+            for cid, doc in zip(chunk_ids, docs):
+                tokens = tokenize(doc or "")
+                self.conn.execute("INSERT INTO docs (chunk_id, length) VALUES (?, ?)", (cid, len(tokens)))
+                self.conn.executemany(
+                    "INSERT INTO postings (term, chunk_id, tf) VALUES (?, ?, ?)",
+                    [(term, cid, tf) for term, tf in Counter(tokens).items()]
+                )
+            self.conn.commit()
+
+    def remove(self, chunk_ids):
+        with self._lock:
+            self._remove(list(chunk_ids))
+            self.conn.commit()
+
+    def _remove(self, chunk_ids):
+        for i in range(0, len(chunk_ids), 500):
+            part = chunk_ids[i:i + 500]
+            marks = ",".join("?" * len(part))
+            self.conn.execute(f"DELETE FROM postings WHERE chunk_id IN ({marks})", part)
+            self.conn.execute(f"DELETE FROM docs WHERE chunk_id IN ({marks})", part)
+
+    def search(self, query: str, n_results: int = 10):
+        """BM25-Suche. Liefert [(chunk_id, score), ...] absteigend nach Score."""
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+
+        scores = Counter()
+        with self._lock:
+            n_docs, total_len = self.conn.execute("SELECT COUNT(*), COALESCE(SUM(length), 0) FROM docs").fetchone()
+            if not n_docs:
+                return []
+            avgdl = total_len / n_docs or 1.0
+
+            for term in terms:
+                rows = self.conn.execute(
+                    "SELECT p.chunk_id, p.tf, d.length FROM postings p "
+                    "JOIN docs d ON d.chunk_id = p.chunk_id WHERE p.term = ?",
+                    (term,)
+                ).fetchall()
+                if not rows:
+                    continue
+                df = len(rows)
+                idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+                for cid, tf, length in rows:
+                    norm = tf + self.k1 * (1 - self.b + self.b * length / avgdl)
+                    scores[cid] += idf * tf * (self.k1 + 1) / norm
+
+        return scores.most_common(n_results)
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+
+def reciprocal_rank_fusion(rankings, k: int = 60):
+    """Vereint mehrere Ranglisten von IDs per Reciprocal Rank Fusion.
+    Liefert alle IDs absteigend nach fusioniertem Score."""
+    scores = Counter()
+    for ranking in rankings:
+        for rank, cid in enumerate(ranking):
+            scores[cid] += 1.0 / (k + rank + 1)
+    return [cid for cid, _ in scores.most_common()]
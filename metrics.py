@@ -0,0 +1,192 @@
+# ================================
+# Leichtgewichtige Zeitmessung pro Verarbeitungsstufe
+#
+# Jede Stufe (Embedding, Chroma add/query, PDF-Extraktion, Chunking,
+# GitHub-Tools, Chat-Aufrufe) wird als Span mit Dauer und Zählern wie
+# chunks, bytes oder tokens erfasst. Spans einer Frage teilen sich eine
+# trace_id. Export als JSON Lines und als Prometheus-Textdatei; summary()
+# liefert die langsamsten Stufen für den stats-Befehl.
+# ================================
+
+import itertools
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+
+# Obergrenzen der Histogramm-Buckets in Sekunden (Prometheus)
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+MAX_SPANS = 10_000      # Gepufferte Spans für den JSONL-Export
+MAX_SAMPLES = 512       # Letzte Dauern pro Stufe für p95
+
+_lock = threading.Lock()
+_ids = itertools.count(1)
+_current = ContextVar("metrics_span", default=None)
+_spans = deque(maxlen=MAX_SPANS)
+_stages = {}
+
+
+class Span:
+    """Laufende Messung; Zähler lassen sich während der Stufe mit add() erhöhen."""
+
+    __slots__ = ("name", "span_id", "trace_id", "parent", "start", "duration", "counts", "error")
+
+    def __init__(self, name, parent=None, **counts):
+        self.name = name
+        self.span_id = f"{os.getpid()}-{next(_ids)}"
+        self.parent = parent.span_id if parent else None
+        self.trace_id = parent.trace_id if parent else self.span_id
+        self.start = time.time()
+        self.duration = None
+        self.counts = dict(counts)
+        self.error = None
+
+    def add(self, **counts):
+        for key, value in counts.items():
+            self.counts[key] = self.counts.get(key, 0) + value
+
+    def to_dict(self):
+        return {"name": self.name, "span_id": self.span_id, "trace_id": self.trace_id,
+                "parent": self.parent, "start": self.start, "dauer_s": self.duration,
+                "counts": self.counts, "fehler": self.error}
+
+
+def _aggregate(data):
+    """Übernimmt einen abgeschlossenen Span (als dict) in Puffer und Statistik."""
+    with _lock:
+        _spans.append(data)
+        stage = _stages.get(data["name"])
+        if stage is None:
+            stage = _stages[data["name"]] = {"anzahl": 0, "summe": 0.0, "max": 0.0, "fehler": 0,
+                                             "buckets": [0] * len(BUCKETS), "counts": {},
+                                             "samples": deque(maxlen=MAX_SAMPLES)}
+        seconds = data["dauer_s"]
+        stage["anzahl"] += 1
+        stage["summe"] += seconds
+        stage["max"] = max(stage["max"], seconds)
+        stage["fehler"] += 1 if data["fehler"] else 0
+        stage["samples"].append(seconds)
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                stage["buckets"][i] += 1
+        for key, value in data["counts"].items():
+            if isinstance(value, (int, float)):
+                stage["counts"][key] = stage["counts"].get(key, 0) + value
+
+
+@contextmanager
+def span(name: str, **counts):
+    """Misst einen Abschnitt als Stufe name.
+
+        with metrics.span("chroma_query", n_results=10) as s:
+            ...
+            s.add(treffer=len(ids))"""
+    parent = _current.get()
+    current = Span(name, parent, **counts)
+    token = _current.set(current)
+    started = time.perf_counter()
+    try:
+        yield current
+    except Exception as e:
+        current.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        current.duration = time.perf_counter() - started
+        _current.reset(token)
+        _aggregate(current.to_dict())
+
+
+def record(name: str, seconds: float, **counts):
+    """Erfasst eine bereits gemessene Dauer (z. B. Time-to-first-token aus dem Stream)."""
+    parent = _current.get()
+    current = Span(name, parent, **counts)
+    current.duration = seconds
+    _aggregate(current.to_dict())
+
+
+def drain():
+    """Entnimmt alle gepufferten Spans (z. B. in einem Worker-Prozess zur Rückgabe)."""
+    with _lock:
+        spans = list(_spans)
+        _spans.clear()
+    return spans
+
+
+def merge(spans):
+    """Übernimmt Spans aus einem anderen Prozess."""
+    for data in spans:
+        _aggregate(data)
+
+
+def summary(limit: int = 10):
+    """Stufen absteigend nach Gesamtzeit mit Anzahl, Mittel, p95, Maximum und Zählern."""
+    with _lock:
+        rows = []
+        for name, s in _stages.items():
+            samples = sorted(s["samples"])
+            p95 = samples[max(0, -(-len(samples) * 95 // 100) - 1)] if samples else 0.0
+            rows.append({"stufe": name, "anzahl": s["anzahl"],
+                         "gesamt_s": round(s["summe"], 3),
+                         "mittel_ms": round(1000 * s["summe"] / s["anzahl"], 1),
+                         "p95_ms": round(1000 * p95, 1), "max_ms": round(1000 * s["max"], 1),
+                         "fehler": s["fehler"], "counts": dict(s["counts"])})
+    rows.sort(key=lambda r: r["gesamt_s"], reverse=True)
+    return rows[:limit]
+
+
+def export_jsonl(path):
+    """Hängt alle seit dem letzten Export abgeschlossenen Spans als JSON Lines an. Liefert die Anzahl."""
+    spans = drain()
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        for data in spans:
+            f.write(json.dumps(data, ensure_ascii=False) + "\n")
+    return len(spans)
+
+
+def _label(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def prometheus_text(prefix: str = "rag") -> str:
+    """Statistik im Prometheus-Textformat (Histogramm pro Stufe plus Zähler)."""
+    lines = [
+        f"# HELP {prefix}_stage_duration_seconds Dauer pro Verarbeitungsstufe",
+        f"# TYPE {prefix}_stage_duration_seconds histogram",
+    ]
+    items = [f"# HELP {prefix}_stage_items_total Verarbeitete Einheiten pro Stufe (chunks, bytes, tokens, ...)",
+             f"# TYPE {prefix}_stage_items_total counter"]
+    errors = [f"# HELP {prefix}_stage_errors_total Fehlgeschlagene Spans pro Stufe",
+              f"# TYPE {prefix}_stage_errors_total counter"]
+    with _lock:
+        for name, s in sorted(_stages.items()):
+            stage = _label(name)
+            for bound, count in zip(BUCKETS, s["buckets"]):
+                lines.append(f'{prefix}_stage_duration_seconds_bucket{{stage="{stage}",le="{bound}"}} {count}')
+            lines.append(f'{prefix}_stage_duration_seconds_bucket{{stage="{stage}",le="+Inf"}} {s["anzahl"]}')
+            lines.append(f'{prefix}_stage_duration_seconds_sum{{stage="{stage}"}} {s["summe"]:.6f}')
+            lines.append(f'{prefix}_stage_duration_seconds_count{{stage="{stage}"}} {s["anzahl"]}')
+            for key, value in sorted(s["counts"].items()):
+                items.append(f'{prefix}_stage_items_total{{stage="{stage}",kind="{_label(key)}"}} {value}')
+            errors.append(f'{prefix}_stage_errors_total{{stage="{stage}"}} {s["fehler"]}')
+    return "\n".join(lines + items + errors) + "\n"
+
+
+def export_prometheus(path, prefix: str = "rag"):
+    """Schreibt die Statistik atomar als Textdatei (z. B. für den node_exporter-Textfile-Collector)."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    tmp.write_text(prometheus_text(prefix), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def reset():
+    with _lock:
+        _spans.clear()
+        _stages.clear()
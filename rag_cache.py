@@ -0,0 +1,57 @@
+# ================================
+# In-Memory-Caches für wiederholte RAG-Fragen
+#
+# LRU-Cache mit Ablaufzeit (TTL) für Frage-Embeddings, Suchergebnisse und
+# optional fertige Antworten. Die Schlüssel basieren auf der normalisierten
+# Frage, damit Groß-/Kleinschreibung und Leerzeichen keine Rolle spielen.
+# ================================
+
+import re
+import threading
+import time
+from collections import OrderedDict
+
+
+def normalize_question(question: str) -> str:
+    """Vereinheitlicht eine Frage für Cache-Schlüssel (Kleinschreibung, Leerzeichen, Satzzeichen am Ende)."""
+    text = re.sub(r"\s+", " ", question.strip().lower())
+    return text.rstrip("?!. ")
+
+
+class TTLCache:
+    """LRU-Cache mit maximaler Größe und Ablaufzeit pro Eintrag."""
+
+    def __init__(self, max_entries: int = 256, ttl: float = 3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()   # Schlüssel → (Ablaufzeitpunkt, Wert)
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or item[0] < time.monotonic():
+                if item is not None:
+                    del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"eintraege": len(self._data), "treffer": self.hits, "fehltreffer": self.misses}
@@ -8,43 +8,184 @@
 #   - Beantwortet Fragen über Model (Ollama)
 # ================================
 
+import time
+_START = time.perf_counter()
+
 import textwrap, shutil
 from pathlib import Path
 import os, sys
-from chromadb import PersistentClient
-from chromadb.config import Settings
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-import requests
-from PyPDF2 import PdfReader
-import ollama
+import threading
+from queue import Queue, Full
 import json
 import re
 from tool_registry import TOOLS, format_output, generate_tool_descriptions
+from tool_router import ToolRouter
+from chat_client import stream_chat, warm_up, chat_stats, warmup_status
+import metrics
+import github_tool
+from index_manifest import IndexManifest, file_hash
+from embeddings import embed_query, get_query_batcher, embed_batch_stream, set_embedding_cache, EMBED_BATCH_SIZE, EMBED_MODEL, EMBED_DIM, EmbeddingError
+from embedding_cache import EmbeddingCache
+from lexical_index import LexicalIndex, reciprocal_rank_fusion
+from rag_cache import TTLCache, normalize_question
+from context_builder import build_context, format_context
+from vector_store import IndexConfigError
+from file_watcher import FileWatcher
+from document_parser import parse_files_parallel, PARSE_WORKERS, CHUNK_ID_SCHEME
 
 # ------------------------------
 # EINSTELLUNGEN
 # ------------------------------
 current_mode = "auto"
 
-PERSIST_DIR = Path("F:/Code/OllamaTest/chroma_db") # Speicherort der Datenbank
-PDF_DIR = "F:/Code/OllamaTest/docs"                 # Ordner für PDFs
-CODE_DIR = "F:/Code/OllamaTest/code"                 # Ordner für Code-Dateien
+# Pfade lassen sich per Umgebungsvariable überschreiben (z. B. für benchmarks/)
+PERSIST_DIR = Path(os.getenv("RAG_PERSIST_DIR", "F:/Code/OllamaTest/chroma_db")) # Speicherort der Datenbank
+PDF_DIR = os.getenv("RAG_PDF_DIR", "F:/Code/OllamaTest/docs")                 # Ordner für PDFs
+CODE_DIR = os.getenv("RAG_CODE_DIR", "F:/Code/OllamaTest/code")                 # Ordner für Code-Dateien
 MODEL_NAME = "llama3"                               # Ollama-Modell, Ilama für GPU Unterstützung
+VECTOR_BACKEND = os.getenv("RAG_VECTOR_BACKEND", "chroma")    # "chroma" oder "numpy" (siehe vector_store.py)
+VECTOR_DTYPE = os.getenv("RAG_VECTOR_DTYPE", "float32")       # numpy-Backend: float32, float16 oder int8
+VECTOR_STORE_PATH = PERSIST_DIR.parent / "vector_store"      # Speicherort des numpy-Backends
+# Manifest und BM25-Index liegen im Ordner des jeweiligen Vektorspeichers: ein Wechsel
+# des Backends oder ein gelöschter Speicherordner indexiert neu, statt alle Dateien als
+# unverändert zu überspringen
+INDEX_DIR = VECTOR_STORE_PATH if VECTOR_BACKEND == "numpy" else PERSIST_DIR
+MANIFEST_PATH = INDEX_DIR / "index_manifest.sqlite"  # Manifest für inkrementelles Indexieren
+EMBED_CACHE_PATH = PERSIST_DIR.parent / "embedding_cache.sqlite"  # Cache: (Modell, SHA-256 des Texts) → Embedding
+EMBED_CACHE_MAX_ENTRIES = 200_000                    # ca. 600 MB bei 768 Dimensionen
+CODE_EXTENSIONS = (".c", ".cpp", ".h", ".py")
+FILE_QUEUE_SIZE = 16                                 # Geparste Dateien zwischen Parse- und Embedding-Stufe
+LEXICAL_INDEX_PATH = INDEX_DIR / "lexical_index.sqlite"  # BM25-Index für die hybride Suche
+RAG_TOP_K = 4                                        # Chunks im Kontext
+RAG_CANDIDATES = 10                                  # Kandidaten pro Suchverfahren vor der Fusion
+RAG_CONTEXT_CANDIDATES = 12                          # Treffer, aus denen der Kontext gebaut wird
+RAG_CONTEXT_TOKENS = 500                             # Token-Budget für den Kontext (≈ bisher 4 Chunks à 500 Zeichen)
+RAG_MMR_LAMBDA = 0.7                                 # 1 = nur Relevanz, 0 = nur Vielfalt
+QUERY_CACHE_SIZE = 256                               # Gecachte Frage-Embeddings/Suchergebnisse
+QUERY_CACHE_TTL = 3600                               # Sekunden
+ANSWER_CACHE_ENABLED = True                          # Antworten auf wiederholte Fragen wiederverwenden
+ANSWER_CACHE_TTL = 3600                              # Sekunden
+KEEP_ALIVE = "30m"                                   # So lange bleibt das Chat-Modell in Ollama geladen
+WARMUP_ENABLED = True                                # Modelle beim Start im Hintergrund laden
+WATCH_ENABLED = os.getenv("RAG_WATCH", "0") == "1"   # Ordner im Hintergrund beobachten (auch per 'watch')
+WATCH_DEBOUNCE = 1.0                                 # Sekunden Ruhe, bevor geänderte Dateien indexiert werden
+WATCH_POLL_INTERVAL = 2.0                            # Abtastintervall, falls watchdog nicht installiert ist
+METRICS_JSONL_PATH = PERSIST_DIR.parent / "metrics.jsonl"   # Export der Spans (stats-Befehl)
+METRICS_PROM_PATH = PERSIST_DIR.parent / "metrics.prom"     # Prometheus-Textdatei (stats-Befehl)
+TOOL_KEYWORDS = ["git", "github", "repo", "repository", "commit", "issue", "fork", "sterne", "pull request"]
 
 # ------------------------------
-# CHROMA INITIALISIEREN
+# SYSTEM-PROMPTS
 # ------------------------------
-client = PersistentClient(path=PERSIST_DIR)
-collection = client.get_or_create_collection("local_knowledge", 
-        metadata={
-        "embedding_model": "nomic-embed-text-v1.5",
-        "embedding_dim": 384,
-        "created": "2025-10-08",
-        "description": "RAG-Datenbank mit GPU-Embeddings von Ollama"
-        }
-    )
-print(f"Datenbankpfad: {PERSIST_DIR}")
-print(f"Vorhandene Collections: {client.list_collections()}")
+# Einmalig erzeugt und bei jedem Aufruf byte-identisch, damit Ollama den
+# bereits verarbeiteten Prompt-Anfang wiederverwenden kann. Alles, was sich
+# pro Frage ändert (Kontext, Tool-Ergebnis, Frage), steht in der User-Nachricht.
+# RAG- und Tool-Antworten teilen sich denselben System-Prompt.
+ANSWER_SYSTEM_PROMPT = (
+    "Du bist ein technischer Assistent. "
+    "Antworte klar, strukturiert und in vollständigen Sätzen. "
+    "Sei präzise, aber liefere genügend Kontext, um die Antwort verständlich zu machen. "
+    "Antworte ausschließlich auf Deutsch. "
+    "Verwende ausschließlich Informationen aus dem gegebenen Kontext bzw. Tool-Ergebnis."
+)
+
+TOOL_SYSTEM_PROMPT = (
+    "Du bist ein KI-Assistent mit Zugriff auf externe Tools.\n"
+    "Verfügbare Tools:\n"
+    f"{generate_tool_descriptions(TOOLS)}\n\n"
+    "Wenn du erkennst, dass eine der Funktionen gemeint ist (auch bei Tippfehlern oder ähnlichen Formulierungen),\n"
+    "fordere die Ausführung eines Tools ausschließlich im JSON-Format an:\n"
+    '{"action": "<Funktionsname>", "arguments": {"<parameter>": "<wert>", ...}}\n'
+    "Beispiele:\n"
+    '- Für `get_repo_stats`: {"repo_name": "repo_name"}\n'
+    '- Für `list_user_repos`: {"username": "user"}\n'
+    "Antworte nur mit JSON, ohne weiteren Text, Markdown oder Erklärung.\n"
+    "Wenn kein passendes Tool zu finden ist, gib normalen Text zurück."
+)
+
+# ------------------------------
+# VEKTORSPEICHER INITIALISIEREN (lazy)
+# ------------------------------
+# Das Backend (chromadb bzw. numpy) wird erst beim ersten Zugriff importiert
+# und geöffnet, damit der Start schnell bleibt, wenn der Index aktuell ist.
+_collection = None
+_collection_checked = False
+_collection_lock = threading.Lock()
+
+def get_collection():
+    """Öffnet den Vektorspeicher beim ersten Aufruf und prüft einmalig, ob er mit
+    EMBED_MODEL und EMBED_DIM erstellt wurde (sonst IndexConfigError)."""
+    global _collection_checked
+    store = open_store()
+    if not _collection_checked:
+        store.check_config(EMBED_MODEL, EMBED_DIM)
+        _collection_checked = True
+    return store
+
+def open_store():
+    """Öffnet den Vektorspeicher (siehe VECTOR_BACKEND) ohne Prüfung der Embedding-Konfiguration."""
+    global _collection
+    with _collection_lock:
+        if _collection is None:
+            started = time.perf_counter()
+            if VECTOR_BACKEND == "numpy":
+                from vector_store import NumpyStore
+                _collection = NumpyStore(VECTOR_STORE_PATH, dtype=VECTOR_DTYPE)
+                print(f"Vektorspeicher: {VECTOR_STORE_PATH} ({_collection.dtype}, {_collection.count()} Chunks)")
+                print(f"Vektorspeicher geöffnet in {(time.perf_counter() - started) * 1000:.0f} ms")
+                return _collection
+
+            from chromadb import PersistentClient
+            from vector_store import ChromaStore
+
+            client = PersistentClient(path=PERSIST_DIR)
+            _collection = ChromaStore(client, "local_knowledge",
+                    metadata={
+                    "embedding_model": EMBED_MODEL,
+                    "embedding_dim": EMBED_DIM,
+                    "description": "RAG-Datenbank mit GPU-Embeddings von Ollama"
+                    }
+                )
+            print(f"Datenbankpfad: {PERSIST_DIR}")
+            print(f"Vorhandene Collections: {client.list_collections()}")
+            print(f"Chroma geöffnet in {(time.perf_counter() - started) * 1000:.0f} ms")
+        return _collection
+
+class _LazyCollection:
+    """Platzhalter, der Zugriffe an die erst bei Bedarf geöffnete Collection weiterreicht."""
+    def __getattr__(self, name):
+        return getattr(get_collection(), name)
+
+collection = _LazyCollection()
+embedding_cache = EmbeddingCache(EMBED_CACHE_PATH, max_entries=EMBED_CACHE_MAX_ENTRIES)
+set_embedding_cache(embedding_cache)
+lexical_index = LexicalIndex(LEXICAL_INDEX_PATH)
+manifest = IndexManifest(MANIFEST_PATH)    # auch Rückverweis Chunk → Dateien für die Suche
+query_embedding_cache = TTLCache(QUERY_CACHE_SIZE, QUERY_CACHE_TTL)
+retrieval_cache = TTLCache(QUERY_CACHE_SIZE, QUERY_CACHE_TTL)      # wird bei Indexänderungen geleert
+answer_cache = TTLCache(QUERY_CACHE_SIZE, ANSWER_CACHE_TTL) if ANSWER_CACHE_ENABLED else None  # ebenso
+tool_router = ToolRouter(TOOLS)
+_index_lock = threading.Lock()    # Start-Indexierung und Watcher nie gleichzeitig
+watcher = None
+index_generation = 0              # Zählt Änderungen am Index (clear_result_caches)
+_generation_lock = threading.Lock()
+
+def clear_result_caches():
+    """Verwirft gecachte Suchergebnisse und Antworten, sobald sich der Index ändert."""
+    global index_generation
+    with _generation_lock:
+        index_generation += 1
+        retrieval_cache.clear()
+        if answer_cache is not None:
+            answer_cache.clear()
+
+def cache_if_current(cache, key, value, generation):
+    """Speichert value nur, wenn sich der Index seit generation nicht geändert hat.
+    Eine Suche, die vor einem Watcher-Lauf begann, würde sonst ihr veraltetes
+    Ergebnis nach dem Leeren der Caches für die ganze TTL ablegen."""
+    with _generation_lock:
+        if generation == index_generation:
+            cache.put(key, value)
 
 
 def print_help():
@@ -53,198 +194,420 @@ Verfügbare Befehle:
   tool   → Schaltet in den Tool-Modus (GitHub-Tools)
   rag    → Schaltet in den Wissensdatenbank-Modus (Chroma)
   auto   → Automatische Erkennung (Standard)
-  status → Zeigt den aktuellen Modus
+  status → Zeigt den aktuellen Modus, die Cache-Statistiken und den Watcher
+  watch  → Schaltet die Live-Indexierung geänderter Dateien ein/aus
+  stats  → Zeigt die langsamsten Verarbeitungsstufen und exportiert die Messwerte
   help   → Zeigt diese Hilfe
   exit   → Beendet das Programm
     """)
 
-def split_code_text(text: str, size: int = 500, overlap: int = 100):
-    """Teilt Code in sinnvolle, überlappende Chunks, ohne mitten in Zeilen zu schneiden."""
-    lines = text.splitlines()
-    chunks = []
-    current_chunk = []
-    current_length = 0
-
-    for line in lines:
-        line = line.rstrip()  # Einrückung bleibt erhalten
-        line_len = len(line) + 1  # +1 für Zeilenumbruch
-        # Prüfen, ob Zeile noch in den aktuellen Chunk passt
-        if current_length + line_len > size and current_chunk:
-            chunks.append("\n".join(current_chunk))
-            # Überlappung: letzte N Zeilen des vorherigen Chunks übernehmen
-            overlap_lines = max(1, int(overlap / (line_len or 1)))
-            current_chunk = current_chunk[-overlap_lines:]
-            current_length = sum(len(l) + 1 for l in current_chunk)
-        current_chunk.append(line)
-        current_length += line_len
-
-    # Rest anhängen
-    if current_chunk:
-        chunks.append("\n".join(current_chunk))
-
-    # Leere oder sehr kurze Chunks rausfiltern
-    cleaned = [c.strip() for c in chunks if len(c.strip()) > 10]
-    return cleaned
-
-def process_code(file_path: str, chunk_size: int = 500, overlap: int = 100):
-    """Liest Code-Dateien ein, chunkt sie intelligent und erstellt Metadaten."""
-    docs, ids, metas = [], [], []
-    filename = os.path.basename(file_path)
-
-    try:
-        with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
-            text = f.read().strip()
-
-        if not text:
-            print(f"Datei {filename} ist leer oder konnte nicht gelesen werden")
-            return docs, ids, metas
-
-        chunks = split_code_text(text, size=chunk_size, overlap=overlap)
-
-        for j, chunk in enumerate(chunks):
-            docs.append(chunk)
-            ids.append(f"code_{filename}_chunk{j}")
-            metas.append({
-                "filename": filename,
-                "chunk_index": j,
-                "path": file_path,
-                "type": "code",
-                "lines": len(chunk.splitlines())
-            })
-
-        print(f"{len(chunks)} Chunks aus {filename} erzeugt.")
-    except Exception as e:
-        print(f"Fehler beim Verarbeiten von {filename}: {e}")
-
-    return docs, ids, metas
-
-def get_local_embeddings(texts, model="nomic-embed-text"):
-    """Holt Embeddings vom lokalen Ollama-Server."""
-    try:
-        response = requests.post(
-            "http://localhost:11434/api/embed",
-            json={"model": model, "input": texts}
-        )
-        response.raise_for_status()
-        data = response.json()
-        return data["embeddings"]
-    except Exception as e:
-        print(f"Fehler beim lokalen Embedding-Request: {e}")
-        return []
+def get_existing_ids(collection, ids, page_size=500):
+    """Prüft seitenweise, welche der übergebenen IDs bereits gespeichert sind.
+    Lädt weder Dokumente noch Metadaten und fragt nur die Kandidaten ab,
+    statt die ganze Collection zu lesen."""
+    existing = set()
+    candidates = list(dict.fromkeys(ids))
+    for start in range(0, len(candidates), page_size):
+        page = collection.get(ids=candidates[start:start + page_size], include=[])
+        existing.update(page.get("ids", []))
+    return existing
+
+class IndexProgress:
+    """Zählt Dateien, Chunks und Embeddings und meldet regelmäßig den Durchsatz."""
+
+    def __init__(self, interval=2.0):
+        self.files = 0
+        self.chunks = 0
+        self.embedded = 0
+        self.interval = interval
+        self.start = self.last = time.monotonic()
+
+    def report(self, force=False):
+        now = time.monotonic()
+        if not force and now - self.last < self.interval:
+            return
+        self.last = now
+        elapsed = max(now - self.start, 1e-9)
+        print(f"[Index] {self.files} Dateien ({self.files / elapsed:.1f}/s) | "
+              f"{self.chunks} Chunks ({self.chunks / elapsed:.1f}/s) | "
+              f"{self.embedded} Embeddings ({self.embedded / elapsed:.1f}/s)")
+
+def _batched(items, size):
+    """Gruppiert einen Iterator in Listen mit höchstens size Elementen."""
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def _new_chunk_batches(collection, chunks, batch_size, on_batch=None):
+    """Gruppiert (doc, id, meta) zu Batches und filtert bereits gespeicherte IDs heraus."""
+    for batch in _batched(chunks, batch_size):
+        unique = {cid: (doc, meta) for doc, cid, meta in batch}
+        existing = get_existing_ids(collection, list(unique))
+        if existing and on_batch:
+            on_batch(list(existing), True)
+        new = [(cid, doc, meta) for cid, (doc, meta) in unique.items() if cid not in existing]
+        if new:
+            yield new, [doc for _, doc, _ in new]
+
+def store_chunk_stream(collection, chunks, batch_size=EMBED_BATCH_SIZE, on_batch=None, progress=None):
+    """Speichert einen Strom von (doc, id, meta) batchweise in der Collection.
+
+    Pro Batch werden bereits vorhandene IDs übersprungen, der Rest parallel
+    eingebettet und eingefügt, sobald seine Embeddings vorliegen – die Chunks
+    sind damit sofort abfragbar. on_batch(ids, ok) wird für jeden fertigen
+    Batch aufgerufen. Gibt die IDs zurück, die nicht gespeichert werden konnten."""
+    failed_ids = set()
+    for batch, embeddings in embed_batch_stream(_new_chunk_batches(collection, chunks, batch_size, on_batch)):
+        ids = [cid for cid, _, _ in batch]
+        if embeddings is None:
+            print(f"Batch mit {len(ids)} Chunks ohne Embeddings – wird übersprungen.")
+            failed_ids.update(ids)
+        else:
+            with metrics.span("chroma_add", chunks=len(ids)):
+                collection.add(
+                    documents=[doc for _, doc, _ in batch],
+                    ids=ids,
+                    metadatas=[meta for _, _, meta in batch],
+                    embeddings=embeddings
+                )
+            with metrics.span("bm25_add", chunks=len(ids)):
+                lexical_index.add(ids, [doc for _, doc, _ in batch])
+            clear_result_caches()
+            if progress:
+                progress.embedded += len(ids)
+                progress.report()
+        if on_batch:
+            on_batch(ids, embeddings is not None)
+    return failed_ids
+
+def print_cache_stats():
+    stats = embedding_cache.stats()
+    print(f"Embedding-Cache: {stats['treffer']} Treffer, {stats['fehltreffer']} Fehltreffer, "
+          f"{stats['eintraege']} Einträge")
 
 def add_new_documents(collection, docs, ids, metadatas):
-    """Fügt neue Dokumente hinzu (lokal via Ollama-Embeddings)."""
-    print(f"{len(docs)} Chunks vorbereitet. Überprüfe bestehende Datenbankeinträge ...")
+    """Fügt neue Dokumente hinzu (lokal via Ollama-Embeddings).
 
-    existing_data = collection.get()
-    existing_ids = set(existing_data.get("ids", []))
+    Die Chunks werden batchweise eingebettet und jeder Batch wird eingefügt,
+    sobald seine Embeddings vorliegen. Gibt die IDs der Chunks zurück,
+    die nicht gespeichert werden konnten (leer = alles erfolgreich)."""
+    print(f"{len(docs)} Chunks vorbereitet. Überprüfe bestehende Datenbankeinträge ...")
 
-    new_docs, new_ids, new_metas = [], [], []
-    for d, i, m in zip(docs, ids, metadatas):
-        if i not in existing_ids:
-            new_docs.append(d)
-            new_ids.append(i)
-            new_metas.append(m)
+    progress = IndexProgress()
+    failed_ids = store_chunk_stream(collection, zip(docs, ids, metadatas), progress=progress)
+    progress.report(force=True)
+    print_cache_stats()
 
-    if not new_docs:
-        print("Keine neuen Chunks gefunden.")
+    if failed_ids:
+        print(f"{len(failed_ids)} Chunks konnten nicht eingebettet werden.")
+    else:
+        print(collection.metadata)
+        print("Datenbank erfolgreich aktualisiert.")
+    return failed_ids
+
+def release_chunks(ids, path=None, keep=()):
+    """Entfernt Chunks, auf die keine andere Datei mehr verweist (Referenzzählung
+    über das Manifest). path ist die Datei, deren Verweise gerade wegfallen;
+    keep sind IDs von Dateien, die noch in der Pipeline stecken."""
+    ids = set(ids) - set(keep)
+    if ids:
+        ids -= manifest.referenced(ids, exclude=path)
+    delete_chunks(collection, ids)
+
+def delete_chunks(collection, ids):
+    """Entfernt Chunks anhand ihrer IDs aus der Collection."""
+    ids = list(dict.fromkeys(ids))
+    if not ids:
         return
-
-    print(f"{len(new_docs)} neue Chunks werden hinzugefügt ...")
-
-    embeddings = get_local_embeddings(new_docs)
-    if not embeddings:
-        print("Keine Embeddings erhalten – Einfügen abgebrochen.")
+    collection.delete(ids=ids)
+    lexical_index.remove(ids)
+    clear_result_caches()
+    print(f"{len(ids)} veraltete Chunks entfernt.")
+
+def sync_lexical_index(page_size=500):
+    """Nimmt Chunks in den BM25-Index auf, die schon vor ihm in Chroma lagen.
+    Läuft nur, wenn die Anzahl der Einträge voneinander abweicht."""
+    total = collection.count()
+    if lexical_index.count() == total:
         return
-
-    collection.add(
-        documents=new_docs,
-        ids=new_ids,
-        metadatas=new_metas,
-        embeddings=embeddings
-    )
-    print(collection.metadata)
-    print("Datenbank erfolgreich aktualisiert.")
-
-def process_pdf(path, chunk_size=500, overlap=100):
-    """Liest eine PDF vollständig ein, chunked seitenübergreifend und behält Seiteninfos."""
-    reader = PdfReader(path)
-
-    full_text = ""
-    page_map = []  # (start_char, end_char, page_number)
-
-    # 1. Gesamten Text + Seitenbereiche erfassen
-    char_index = 0
-    for page_num, page in enumerate(reader.pages, start=1):
-        text = page.extract_text() or ""
-        start = char_index
-        end = char_index + len(text)
-        page_map.append((start, end, page_num))
-        full_text += text + "\n"
-        char_index = end + 1
-
-    # 2. Mit RecursiveCharacterTextSplitter aufteilen
-    splitter = RecursiveCharacterTextSplitter(
-        chunk_size=chunk_size,
-        chunk_overlap=overlap,
-        length_function=len,
-        separators=["\n\n", "\n", ".", " ", ""]
-    )
-    chunks = splitter.split_text(full_text)
-
-    # 3. IDs, Metadaten und Dokumente erzeugen
-    docs, ids, metadatas = [], [], []
-    base_name = os.path.basename(path)
-
-    for idx, chunk in enumerate(chunks):
-        # Finde zugehörige Seiten basierend auf Characterposition
-        start_char = full_text.find(chunk)
-        end_char = start_char + len(chunk)
-        pages_in_chunk = [
-            p for (s, e, p) in page_map if not (e < start_char or s > end_char)
-        ]
-        page_info = f"{min(pages_in_chunk)}-{max(pages_in_chunk)}" if len(pages_in_chunk) > 1 else str(pages_in_chunk[0])
-
-        docs.append(chunk)
-        ids.append(f"{base_name}_chunk_{idx}")
-        metadatas.append({
-            "source": base_name,
-            "pages": page_info,
-            "path": path
-        })
-
-    print(f"{len(chunks)} Chunks aus {base_name} erzeugt.")
-    return docs, ids, metadatas
-
-def index_files(chunk_size=500, overlap=100):
-    """Liest PDFs und Code-Dateien, chunkt und speichert sie in Chroma."""
-    docs, ids, metadatas = [], [], []
-
-    # PDFs verarbeiten
+    print("Gleiche lexikalischen Index mit der Datenbank ab ...")
+    added = 0
+    for offset in range(0, total, page_size):
+        page = collection.get(include=["documents"], limit=page_size, offset=offset)
+        known = lexical_index.contains(page["ids"])
+        new = [(cid, doc) for cid, doc in zip(page["ids"], page["documents"]) if cid not in known]
+        if new:
+            lexical_index.add([cid for cid, _ in new], [doc for _, doc in new])
+            added += len(new)
+    print(f"{added} Chunks in den lexikalischen Index übernommen.")
+
+def discover_files():
+    """Liefert alle zu indexierenden Dateien als (Pfad, Art)."""
     if os.path.isdir(PDF_DIR):
         for file in os.listdir(PDF_DIR):
             if file.lower().endswith(".pdf"):
-                path = os.path.join(PDF_DIR, file)
-                print(f"Lade PDF: {file}")
-                d, i, m = process_pdf(path, chunk_size, overlap)
-                docs += d; ids += i; metadatas += m
+                yield os.path.join(PDF_DIR, file), "pdf"
 
-    # Code verarbeiten
     if os.path.isdir(CODE_DIR):
-        print(f"Lade Code aus {CODE_DIR}")
         for root, _, files in os.walk(CODE_DIR):
             for file in files:
-                if file.endswith((".c", ".cpp", ".h", ".py")):
-                    path = os.path.join(root, file)
-                    d, i, m = process_code(path, chunk_size, overlap)
-                    docs += d; ids += i; metadatas += m
-
-    # Neue Dokumente hinzufügen
-    if docs:
-        add_new_documents(collection, docs, ids, metadatas)
-    else:
+                if file.endswith(CODE_EXTENSIONS):
+                    yield os.path.join(root, file), "code"
+
+def _in_scope(path, targets):
+    """True, wenn path einer der Pfade in targets ist oder in einem dieser Ordner liegt."""
+    path = os.path.normcase(os.path.normpath(path))
+    return any(path == t or path.startswith(t.rstrip(os.sep) + os.sep) for t in targets)
+
+def index_files(chunk_size=500, overlap=100, workers=PARSE_WORKERS, paths=None):
+    """Liest PDFs und Code-Dateien inkrementell, chunkt und speichert sie in Chroma.
+
+    Läuft als Pipeline: finden → parsen/chunken → einbetten → einfügen.
+    Über das Manifest werden unveränderte Dateien vor dem Parsen übersprungen,
+    geänderte Dateien ersetzt und gelöschte Dateien aus der Collection entfernt.
+    Chunk-IDs sind Inhalts-Hashes: gleicher Text in mehreren Dateien wird nur
+    einmal eingebettet und gespeichert, das Manifest merkt sich alle Fundstellen.
+    Das Parsen läuft parallel in einem Hintergrund-Thread und ist über eine
+    begrenzte Queue mit dem Einbetten verbunden, sodass der Speicherbedarf
+    unabhängig von der Korpusgröße bleibt und jeder Batch sofort abfragbar ist.
+    Mit paths (Dateien oder Ordner, z. B. vom Watcher) werden nur diese
+    abgeglichen; fehlende Pfade gelten als gelöscht."""
+    with _index_lock:
+        _index_files(chunk_size, overlap, workers, paths)
+
+def _index_files(chunk_size, overlap, workers, paths):
+    check_index_config(manifest)
+    progress = IndexProgress()
+    pending = {}        # Pfad → (Art, stat, Hash, alter Manifest-Eintrag), bis die Datei fertig ist
+    file_ids = {}       # Pfad → (Chunk-IDs, Metadaten) der Datei, solange sie in der Pipeline ist
+    remaining = {}      # Pfad → Anzahl noch nicht gespeicherter Chunks
+    chunk_owner = {}    # Chunk-ID → Pfade, die auf den Chunk warten (nur Chunks in der Pipeline)
+    failed_files = set()
+    counts = {"skipped": 0, "stored": 0, "failed": 0}
+    file_queue = Queue(maxsize=FILE_QUEUE_SIZE)
+    stop = threading.Event()
+
+    # 1. Dateien finden; gelöschte Dateien zuerst austragen. Ihre Chunks werden
+    #    nur entfernt, wenn keine andere Datei denselben Text enthält
+    files = list(discover_files())
+    seen = {path for path, _ in files}
+    removed = []
+    for kind, folder in (("pdf", PDF_DIR), ("code", CODE_DIR)):
+        if os.path.isdir(folder):
+            removed += [p for p in manifest.paths(kind) if p not in seen]
+    if paths is not None:
+        targets = [os.path.normcase(os.path.normpath(p)) for p in paths]
+        files = [(p, kind) for p, kind in files if _in_scope(p, targets)]
+        removed = [p for p in removed if _in_scope(p, targets)]
+    for path in removed:
+        ids = manifest.get(path)["chunk_ids"]
+        manifest.remove(path)
+        release_chunks(ids)
+    manifest.commit()
+
+    if not files and paths is None:
         print("Keine Dateien gefunden.")
 
+    def changed_files():
+        """Filtert unveränderte Dateien über das Manifest heraus."""
+        for path, kind in files:
+            try:
+                stat = os.stat(path)
+                entry = manifest.get(path)
+                # Unverändert laut mtime/Größe → nicht einmal lesen
+                if manifest.is_unchanged(entry, stat):
+                    counts["skipped"] += 1
+                    continue
+                digest = file_hash(path)
+            except OSError as e:
+                print(f"Datei {path} nicht lesbar: {e}")
+                continue
+
+            # Nur Zeitstempel geändert, Inhalt identisch
+            if entry and entry["hash"] == digest:
+                manifest.touch(path, stat)
+                counts["skipped"] += 1
+                continue
+
+            pending[path] = (kind, stat, digest, entry)
+            yield path, kind
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                file_queue.put(item, timeout=0.5)
+                return True
+            except Full:
+                pass
+        return False
+
+    def parse_stage():
+        """2. Parsen und Chunken (Hintergrund-Thread, Prozess-Pool)."""
+        results = parse_files_parallel(changed_files(), workers=workers, chunk_size=chunk_size, overlap=overlap)
+        try:
+            for item in results:
+                if not put(item):
+                    return
+        except Exception as e:
+            print(f"Fehler beim Parsen: {e}")
+        finally:
+            results.close()
+            put(None)
+
+    def release(ids):
+        """Entfernt nicht mehr referenzierte Chunks, außer sie stecken noch in der Pipeline."""
+        if ids:
+            release_chunks(ids, keep={cid for other_ids, _ in file_ids.values() for cid in other_ids})
+
+    def finish_file(path):
+        """Schreibt das Manifest fort, sobald alle Chunks einer Datei gespeichert sind.
+
+        Erst dann werden alte Chunks entfernt, deren Text weggefallen ist. Ist
+        ein Batch der Datei gescheitert, behält sie ihren Manifest-Eintrag und
+        ihre alten Chunks; schon gespeicherte neue Chunks werden wieder entfernt."""
+        kind, stat, digest, entry = pending.pop(path)
+        ids, metas = file_ids.pop(path)
+        old = set(entry["chunk_ids"]) if entry else set()
+        if path in failed_files:
+            failed_files.discard(path)
+            counts["failed"] += 1
+            release(get_existing_ids(collection, set(ids) - old))
+            return
+        manifest.update(path, kind, stat, digest, ids, metas)
+        release(old - set(ids))
+        counts["stored"] += 1
+        if counts["stored"] % 100 == 0:
+            manifest.commit()
+
+    def on_batch(ids, ok):
+        for cid in ids:
+            for path in chunk_owner.pop(cid, ()):
+                if not ok:
+                    failed_files.add(path)
+                remaining[path] -= 1
+                if remaining[path] == 0:
+                    del remaining[path]
+                    finish_file(path)
+
+    def file_chunks():
+        """Liefert die Chunks der geparsten Dateien als (doc, id, meta)."""
+        while True:
+            item = file_queue.get()
+            if item is None:
+                return
+            path, kind, result, error = item
+            progress.files += 1
+            progress.report()
+
+            # Fehlgeschlagene Dateien behalten ihre alten Chunks und ihren
+            # Manifest-Eintrag und werden beim nächsten Start erneut versucht
+            # (gilt auch für gescheiterte Batches, siehe finish_file)
+            if error is not None:
+                print(f"Fehler beim Verarbeiten von {os.path.basename(path)}: {error}")
+                pending.pop(path, None)
+                counts["failed"] += 1
+                continue
+
+            docs, ids, metas = result
+
+            # Doppelte Chunks (in der Datei selbst oder in einer anderen Datei
+            # der Pipeline) werden nur einmal eingebettet; die Datei wartet dann
+            # auf den Batch, der den Chunk schon enthält
+            file_ids[path] = (ids, metas)
+            new, waiting = [], set()
+            for doc, cid, meta in zip(docs, ids, metas):
+                if cid in waiting:
+                    continue
+                waiting.add(cid)
+                if cid in chunk_owner:
+                    chunk_owner[cid].append(path)
+                else:
+                    chunk_owner[cid] = [path]
+                    new.append((doc, cid, meta))
+            if not waiting:
+                finish_file(path)
+                continue
+            remaining[path] = len(waiting)
+            progress.chunks += len(ids)
+            yield from new
+
+    producer = threading.Thread(target=parse_stage, name="index-parse", daemon=True)
+    producer.start()
+    try:
+        # 3. + 4. Einbetten und Einfügen, Batch für Batch
+        store_chunk_stream(collection, file_chunks(), on_batch=on_batch, progress=progress)
+    finally:
+        stop.set()
+        producer.join()
+        manifest.commit()
+
+    # Abgleich nur, wenn sich etwas geändert hat oder der BM25-Index noch leer ist –
+    # sonst müsste Chroma bei jedem Start geöffnet werden
+    if counts["stored"] or removed or not lexical_index.count():
+        sync_lexical_index()
+    progress.report(force=True)
+    print_cache_stats()
+    print(f"{counts['skipped']} unveränderte Dateien übersprungen, {counts['stored']} neu/geändert, "
+          f"{counts['failed']} fehlgeschlagen, {len(removed)} gelöscht.")
+
+def check_index_config(manifest):
+    """Baut den Index neu auf, wenn Embedding-Modell, -Dimension oder das Schema
+    der Chunk-IDs geändert wurden.
+
+    Die Konfiguration steht auch im Manifest, damit der Vergleich ohne Öffnen
+    des Vektorspeichers auskommt. Die Embeddings kommen beim Neuaufbau aus dem
+    Cache (der volle Vektoren speichert), nur das Kürzen läuft erneut."""
+    global _collection_checked
+    config = {"embedding_model": EMBED_MODEL, "embedding_dim": str(EMBED_DIM), "chunk_ids": CHUNK_ID_SCHEME}
+    if manifest.get_info() == config:
+        return
+    paths = manifest.paths()
+    if paths:
+        print(f"Embedding-Konfiguration geändert ({manifest.get_info() or 'unbekannt'} → {config}) – "
+              f"Index wird neu aufgebaut ...")
+    # BM25-Einträge gelöschter Dateien würden nach dem Neuaufbau sonst verwaist bleiben
+    for path in paths:
+        lexical_index.remove(manifest.get(path)["chunk_ids"])
+    store = open_store()
+    store.clear()
+    store.set_metadata(embedding_model=EMBED_MODEL, embedding_dim=EMBED_DIM)
+    _collection_checked = True
+    manifest.clear()
+    manifest.set_info(**config)
+    manifest.commit()
+    query_embedding_cache.clear()
+    clear_result_caches()
+
+def reindex_paths(paths):
+    """Callback des Watchers: gleicht nur die geänderten Dateien mit dem Index ab,
+    während weiter Fragen beantwortet werden."""
+    print(f"\n[Watcher] {len(paths)} Änderung(en) – aktualisiere Index ...")
+    with metrics.span("index_watch", dateien=len(paths)):
+        index_files(workers=PARSE_WORKERS, paths=paths)
+
+def start_watcher(catch_up=False):
+    """Startet den Watcher für PDF_DIR und CODE_DIR. catch_up gleicht die Ordner
+    zuerst einmal ab (für Änderungen, während der Watcher aus war)."""
+    global watcher
+    if watcher is None:
+        watcher = FileWatcher([PDF_DIR, CODE_DIR], reindex_paths, extensions=(".pdf",) + CODE_EXTENSIONS,
+                              debounce=WATCH_DEBOUNCE, poll_interval=WATCH_POLL_INTERVAL)
+    watcher.start()
+    if catch_up:
+        for folder in watcher.folders:
+            watcher.notify(folder, is_dir=True)
+    print(f"Watcher gestartet ({watcher.mode}): {', '.join(watcher.folders) or 'keine Ordner gefunden'}")
+
+def stop_watcher():
+    if watcher is not None and watcher.running:
+        watcher.stop()
+        print("Watcher gestoppt.")
+
 def show_chunks(limit=1000):
     """Zeigt gespeicherte Chunks in der Chroma-Datenbank (mit Metadaten und Vorschau)."""
     print("\n=== Gespeicherte Chunks ===")
@@ -332,32 +695,80 @@ def handle_command(cmd: str):
         print("Modus geändert zu: Automatisch")
     elif cmd == "status":
         print(f"Aktueller Modus: {current_mode}")
+        for label, value in status_info().items():
+            print(f"{label + ':':<24}{value}")
+    elif cmd == "stats":
+        print_stage_stats()
+    elif cmd == "watch":
+        if watcher is not None and watcher.running:
+            stop_watcher()
+        else:
+            start_watcher(catch_up=True)
     elif cmd == "help":
         print_help()
     elif cmd in ("exit", "quit"):
         print("Programm wird beendet.")
         sys.exit(0)
     else:
-        # An dieser Stelle wird dein bisheriger Code eingebunden:
-        if current_mode == "tool":
-            print(f"[TOOL] Anfrage: {cmd}")
-            ask_with_tools(cmd)
+        # Alle Stufen einer Frage teilen sich eine trace_id (siehe stats-Befehl)
+        with metrics.span(f"anfrage.{current_mode}"):
+            # An dieser Stelle wird dein bisheriger Code eingebunden:
+            if current_mode == "tool":
+                print(f"[TOOL] Anfrage: {cmd}")
+                ask_with_tools(cmd)
             
-        elif current_mode == "rag":
-            print(f"[RAG] Anfrage: {cmd}")
-            ask_rag(cmd)
+            elif current_mode == "rag":
+                print(f"[RAG] Anfrage: {cmd}")
+                ask_rag(cmd)
 
-        else:  # auto
-            print(f"[AUTO] Anfrage: {cmd}")
-            if any(x in cmd for x in ["git","github","repo","repository", "commit", "issue", "fork", "sterne", "pull request"]):
-                print("Tool-Mode")
-                return ask_rag(cmd)
+            else:  # auto
+                print(f"[AUTO] Anfrage: {cmd}")
+                if choose_mode(cmd) == "tool":
+                    print("Tool-Mode")
+                    return ask_with_tools(cmd)
 
-            else:
-                print("Rag-Mode")
-                return ask_with_tools(cmd)
+                else:
+                    print("Rag-Mode")
+                    return ask_rag(cmd)
 
 
+def choose_mode(question: str) -> str:
+    """Automatische Moduswahl: GitHub-Begriffe → Tool, sonst Wissensdatenbank."""
+    q_lower = question.lower()
+    return "tool" if any(x in q_lower for x in TOOL_KEYWORDS) else "rag"
+
+
+def status_info() -> dict:
+    """Cache-, Router- und Generierungsstatistik (status-Befehl und Server)."""
+    info = {"Cache Frage-Embeddings": query_embedding_cache.stats(),
+            "Cache Suchergebnisse": retrieval_cache.stats()}
+    if answer_cache is not None:
+        info["Cache Antworten"] = answer_cache.stats()
+    info["Cache GitHub-API"] = github_tool.get_response_cache().stats()
+    info["Tool-Router"] = tool_router.stats()
+    if get_query_batcher() is not None:
+        info["Embedding-Batcher"] = get_query_batcher().stats()
+    info["Vorwärmen"] = warmup_status()
+    info["Watcher"] = watcher.status() if watcher is not None else "aus"
+    info["Generierung"] = chat_stats()
+    return info
+
+
+def print_stage_stats(limit=10):
+    """Zeigt die Stufen mit der größten Gesamtzeit und exportiert alle Messwerte."""
+    rows = metrics.summary(limit)
+    if not rows:
+        print("Noch keine Messwerte vorhanden.")
+        return
+    print(f"\n{'Stufe':<28}{'Anzahl':>8}{'Gesamt s':>10}{'Mittel ms':>11}{'p95 ms':>10}{'Max ms':>10}  Zähler")
+    for r in rows:
+        counts = ", ".join(f"{k}={v}" for k, v in r["counts"].items())
+        print(f"{r['stufe']:<28}{r['anzahl']:>8}{r['gesamt_s']:>10.3f}{r['mittel_ms']:>11.1f}"
+              f"{r['p95_ms']:>10.1f}{r['max_ms']:>10.1f}  {counts}")
+    exported = metrics.export_jsonl(METRICS_JSONL_PATH)
+    metrics.export_prometheus(METRICS_PROM_PATH)
+    print(f"\n{exported} Spans nach {METRICS_JSONL_PATH} exportiert, Prometheus-Datei: {METRICS_PROM_PATH}")
+
 def extract_json(text: str):
     """Versucht, eingebettetes JSON aus einem Text zu extrahieren.
     Gibt den JSON-String zurück oder wirft eine Exception, wenn keins gefunden wird."""
@@ -375,161 +786,267 @@ def extract_json(text: str):
     except json.JSONDecodeError as e:
         raise ValueError(f"Ungültiges JSON im Text gefunden: {e}")
 
-def ask_with_tools(question: str):
-    """Verarbeitet Fragen, die Tools (z. B. GitHub) benötigen."""
-    tool_descriptions = generate_tool_descriptions(TOOLS)
-
-    system_prompt = f"""
-                        Du bist ein KI-Assistent mit Zugriff auf externe Tools.
-                        Verfügbare Tools:
-                        {tool_descriptions}
-
-                        Wenn du erkennst, dass eine der Funktionen gemeint ist(auch bei Tippfehlern oder ähnlichen Formulierungen),
-                        fordere die Ausführung eines Tools außschließlich im JSON-Format an:
-                        {{
-                        "action": "<Funktionsname>",
-                        "arguments": {{ "<parameter>": "<wert>", ... }}
-                        }}
-                        Beispiele:
-                        - Für `get_repo_stats`: {{"repo_name": "repo_name"}}
-                        - Für `list_user_repos`: {{"username": "user"}}
-                        Antworte nur mit JSON, ohne weiteren Text, Markdown oder Erklärung.
-                        Wenn kein passendes Tool zu finden ist, gib normalen Text zurück.
-                        """
-    
-
-    messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": question}
-        ]
-    # Modell wählt Tool-Funktion aus
-    response = ollama.chat(
-        model=MODEL_NAME,
-        messages=messages
+def tool_messages(action: str, args: dict, question: str):
+    """Führt ein Tool aus und baut die Nachrichten, mit denen das Modell das
+    Ergebnis zusammenfasst. Liefert (Ergebnistext, Nachrichten)."""
+    func = TOOLS[action]["function"]
+    with metrics.span(f"tool.{action}"):
+        result = func(**args)
+    result_text = format_output(result)
+
+    answer_prompt = (
+        "Analysiere und fasse das Tool-Ergebnis nur anhand der angezeigten Daten zusammen.\n"
+        "Verwende keine eigenen Zusatzinformationen oder externes Wissen.\n"
+        "Wenn es sich um viele Daten handelt, kannst du sie analysieren wenn die Frage danach fragt.\n\n"
+        f"--- TOOL-ERGEBNIS ---\n{result_text}\n--- ENDE ---\n\n"
+        f"FRAGE: {question}"
     )
-    content = response["message"]["content"].strip()
-    
+    messages = [{"role": "system", "content": ANSWER_SYSTEM_PROMPT},
+                {"role": "user", "content": answer_prompt}]
+    return result_text, messages
+
+def run_tool(action: str, args: dict, question: str):
+    """Führt ein Tool aus und lässt das Modell das Ergebnis zusammenfassen."""
+    result_text, messages = tool_messages(action, args, question)
+    print("\n--- Ergebnis (Tool) ---\n")
+    print(result_text)
+
+    # Modell antwortet auf Grundlage des Tool-Outputs
+    stream = stream_chat(MODEL_NAME, messages, label="tool", keep_alive=KEEP_ALIVE)
+    print("\n--- Antwort (nach Tool-Call) ---\n")
+    print_stream(stream)
+    stream.report()
+
+def select_tool(question: str) -> dict:
+    """Wählt Tool und Argumente für eine Frage.
+
+    Eindeutige Anfragen (z. B. "offene Issues von owner/repo") entscheidet der
+    Router ohne LLM-Auswahlrunde, sonst wählt das Modell. Liefert ein dict mit
+    quelle ("router"/"modell"), action und args; action ist None, wenn das
+    Modell kein gültiges Tool nennt – text enthält dann seine Antwort."""
+    routed = tool_router.route(question)
+    if routed:
+        action, args = routed
+        return {"quelle": "router", "action": action, "args": args, "text": None}
+
+    messages = [
+        {"role": "system", "content": TOOL_SYSTEM_PROMPT},
+        {"role": "user", "content": question}
+    ]
+    # Modell wählt Tool-Funktion aus
+    content = "".join(stream_chat(MODEL_NAME, messages, label="tool-auswahl", keep_alive=KEEP_ALIVE)).strip()
 
     try:
         data = json.loads(extract_json(content))
-        action = data.get("action")
-        args = data.get("arguments", {})
-
-        if action in TOOLS:
-            func = TOOLS[action]["function"]
-            print(f"\n[Tool-Auswahl] Modell ruft auf: {action} mit Argumenten: {args}\n")
-            result = func(**args)
-            print("\n--- Ergebnis (Tool) ---\n")
-            result_text = format_output(result)
-            print(result_text)
-
-            answer_prompt = f"""
-                Du bist jetzt im Antwortmodus.
-
-                Analysiere und fasse das Tool-Ergebnis nur anhand der angezeigten Daten zusammen.
-                Verwende keine eigenen Zusatzinformationen oder externes Wissen.
-
-                Antworte auf Deutsch in vollständigen, gut lesbaren Sätzen.
-                Wenn es sich um viele Daten handelt, kannst du sie analysieren wenn die Frage danach fragt.
-                --- TOOL-ERGEBNIS ---
-                {result_text}
-                --- ENDE ---
-
-                Frage: {question}
-                """
-
-            # Modell antwortet auf Grundlage des Tool-Outputs
-            final = ollama.chat(
-                model=MODEL_NAME,
-                messages=[{"role": "system", "content": answer_prompt}])
-            print("\n--- Antwort (nach Tool-Call) ---\n")
-            print(final["message"]["content"])
-            return
+    except ValueError:
+        # Kein (gültiges) JSON → das Modell hat normal geantwortet
+        return {"quelle": "modell", "action": None, "args": {}, "text": content}
+    action = data.get("action")
+    return {"quelle": "modell", "action": action if action in TOOLS else None,
+            "args": data.get("arguments", {}), "text": content}
 
+def ask_with_tools(question: str):
+    """Verarbeitet Fragen, die Tools (z. B. GitHub) benötigen."""
+    choice = select_tool(question)
+    action, args = choice["action"], choice["args"]
+    if action is not None:
+        if choice["quelle"] == "router":
+            print(f"\n[Tool-Router] Direkter Aufruf: {action} mit Argumenten: {args}\n")
         else:
-            print(f"Unbekannte Aktion: {action}")
-
-    except json.JSONDecodeError:
-        print("\n JSON Fehler ---\n")
-        print(content)
+            print(f"\n[Tool-Auswahl] Modell ruft auf: {action} mit Argumenten: {args}\n")
+        run_tool(action, args, question)
+        return
 
     print("\n--- Antwort (Text) ---\n")
-    print(content)
-
-def ask_rag(question: str):
-    """Durchsucht die lokale Wissensdatenbank (Chroma) und fragt das Modell."""
+    print(choice["text"])
+
+def retrieve(question: str, n_results: int = RAG_TOP_K):
+    """Hybride Suche: Vektor- und BM25-Treffer werden per Reciprocal Rank Fusion vereint.
+    Liefert die besten n_results Treffer als Liste von (id, dokument, metadaten).
+    Frage-Embeddings und Ergebnisse werden für wiederholte Fragen gecacht."""
+    key = normalize_question(question)
+    cached = retrieval_cache.get((key, n_results))
+    if cached is not None:
+        return cached
+
+    generation = index_generation
+    with metrics.span("retrieve", n_results=n_results):
+        result = _retrieve(question, key, n_results)
+    cache_if_current(retrieval_cache, (key, n_results), result, generation)
+    return result
+
+def _retrieve(question, key, n_results):
+    q_emb = query_embedding_cache.get(key)
+    if q_emb is None:
+        q_emb = embed_query(question)
+        query_embedding_cache.put(key, q_emb)
+    candidates = max(n_results, RAG_CANDIDATES)
+
+    with metrics.span("chroma_query", n_results=candidates):
+        results = collection.query(
+            query_embeddings=[q_emb],                   # <-- statt query_texts
+            n_results=candidates,
+            #where=filter_chunks(question),
+            include=["documents", "metadatas"]
+        )
 
-    q_emb = get_local_embeddings([question])[0]
+    hits = {}
+    vector_ids = []
+    if results["ids"] and results["ids"][0]:
+        for cid, doc, meta in zip(results["ids"][0], results["documents"][0], results["metadatas"][0]):
+            hits[cid] = (doc, meta)
+            vector_ids.append(cid)
+
+    with metrics.span("bm25_search", n_results=candidates):
+        lexical_ids = [cid for cid, _ in lexical_index.search(question, candidates)]
+    fused = reciprocal_rank_fusion([vector_ids, lexical_ids])[:n_results]
+
+    # Nur lexikalisch gefundene Chunks nachladen
+    missing = [cid for cid in fused if cid not in hits]
+    if missing:
+        with metrics.span("chroma_get", chunks=len(missing)):
+            data = collection.get(ids=missing, include=["documents", "metadatas"])
+        for cid, doc, meta in zip(data["ids"], data["documents"], data["metadatas"]):
+            hits[cid] = (doc, meta)
+
+    return _with_sources([(cid, *hits[cid]) for cid in fused if cid in hits])
+
+def _with_sources(hits):
+    """Ergänzt die Metadaten jedes Treffers um alle Dateien, die den Chunk-Text enthalten.
+
+    Gespeichert ist ein Chunk nur mit den Metadaten vom Zeitpunkt, als ihn eine
+    Datei zuerst geliefert hat – nach einer Änderung stimmen chunk_index und
+    Seiten dort nicht mehr. Die Fundstelle (Pfad, chunk_index, Seiten) kommt
+    deshalb aus dem Manifest, bevorzugt für die gespeicherte Datei; die
+    gespeicherten Metadaten gelten nur für Chunks ohne Manifest-Eintrag."""
+    sources = manifest.sources([cid for cid, _, _ in hits])
+    result = []
+    for cid, doc, meta in hits:
+        meta = meta or {}
+        locations = sources.get(cid)
+        if locations:
+            paths = [m.get("path") for m in locations]
+            location = next((m for m in locations if m.get("path") == meta.get("path")), locations[0])
+            meta = dict(location, sources=paths)
+        result.append((cid, doc, meta))
+    return result
+
+def prepare_rag(question: str):
+    """Sucht den Kontext zu einer Frage und baut die Chat-Nachrichten.
+
+    Liefert None, wenn nichts gefunden wurde, sonst ein dict mit blocks,
+    stats (siehe build_context), messages, answer_key, generation und cached
+    (gespeicherte Antwort oder None). Wirft EmbeddingError, wenn Ollama nicht erreichbar ist."""
+    generation = index_generation   # für store_answer: Index seitdem unverändert?
+    hits = retrieve(question, RAG_CONTEXT_CANDIDATES)
+    if not hits:
+        return None
+
+    # Kontext: Duplikate und Überlappungen entfernen, Nachbarn zusammenführen, ins Budget packen
+    with metrics.span("context_build") as span:
+        blocks, ctx_stats = build_context(hits, RAG_CONTEXT_TOKENS, RAG_MMR_LAMBDA)
+        span.add(chunks=ctx_stats["chunks"], tokens=ctx_stats["tokens_nachher"])
+    context = format_context(blocks)
+    used_ids = [cid for block in blocks for cid in block.chunk_ids]
 
-    results = collection.query(
-        query_embeddings=[q_emb],                   # <-- statt query_texts
-        n_results=4,
-        #where=filter_chunks(question),
-        include=["documents", "metadatas"]
+    prompt = (
+        "Nutze ausschließlich die folgenden Informationen, um die Frage zu beantworten.\n"
+        "Wenn du im Kontext keine direkte Antwort findest, gib eine plausible Zusammenfassung der gefundenen Inhalte wieder.\n\n"
+        f"--- KONTEXT START ---\n{context}\n--- KONTEXT ENDE ---\n\n"
+        f"FRAGE: {question}"
     )
 
-    if not results["documents"] or not results["documents"][0]:
+    # Gleiche Frage mit denselben Treffern → gespeicherte Antwort; jede
+    # Änderung am Index leert den Cache (clear_result_caches)
+    answer_key = (normalize_question(question), tuple(sorted(used_ids)))
+    return {
+        "blocks": blocks,
+        "stats": ctx_stats,
+        "messages": [{"role": "system", "content": ANSWER_SYSTEM_PROMPT},
+                     {"role": "user", "content": prompt}],
+        "answer_key": answer_key,
+        "generation": generation,
+        "cached": answer_cache.get(answer_key) if answer_cache else None,
+    }
+
+def store_answer(rag: dict, answer: str):
+    if answer_cache is not None and answer:
+        cache_if_current(answer_cache, rag["answer_key"], answer, rag["generation"])
+
+def ask_rag(question: str):
+    """Durchsucht die lokale Wissensdatenbank (Chroma + BM25) und fragt das Modell."""
+    try:
+        rag = prepare_rag(question)
+    except EmbeddingError as e:
+        print(f"Frage konnte nicht eingebettet werden (läuft Ollama?): {e}")
+        return
+    except IndexConfigError as e:
+        print(f"Index passt nicht zur Konfiguration: {e}")
+        return
+    if rag is None:
         print("Keine passenden Informationen gefunden.")
         return
 
-    # Kontext aus besten Treffern
-    context = "\n".join(results["documents"][0])
-
     # Quellenanzeige
+    ctx_stats = rag["stats"]
     print("\n=== Gefundene Quellen ===")
-    for i, meta in enumerate(results["metadatas"][0]):
-        cid = results["ids"][0][i] if "ids" in results else f"chunk_{i}"
-        info = f"→ {cid}"
-        if meta:
-            if meta.get("filename"):
-                info += f" | Datei: {meta['filename']}"
-            if meta.get("page"):
-                info += f" | Seite: {meta['page']}"
-        print(info)
+    for block in rag["blocks"]:
+        print(f"→ {block.label} | Chunks: {', '.join(block.chunk_ids)}")
+    print(f"Kontext: {ctx_stats['kandidaten']} Treffer → {ctx_stats['bloecke']} Abschnitte "
+          f"({ctx_stats['chunks']} Chunks), ca. {ctx_stats['tokens_nachher']} statt "
+          f"{ctx_stats['tokens_vorher']} Tokens")
     print("==========================\n")
 
-    prompt = (
-        "Nutze ausschließlich die folgenden Informationen, um die Frage zu beantworten.\n"
-        "Wenn du im Kontext keine direkte Antwort findest, gib eine plausible Zusammenfassung der gefundenen Inhalte wieder.\n\n"
-        f"--- KONTEXT START ---\n{context}\n--- KONTEXT ENDE ---\n\n"
-        f"FRAGE: {question}"
-    )
+    if rag["cached"] is not None:
+        print("\n--- Antwort (aus Cache) ---\n")
+        print_wrapped(rag["cached"])
+        return
 
-    system_content = (
-        "Du bist ein technischer Assistent. "
-        "Antworte klar, strukturiert und in vollständigen Sätzen. "
-        "Sei präzise, aber liefere genügend Kontext, um die Antwort verständlich zu machen. "
-        "Antworte ausschließlich auf Deutsch. "
-        "Verwende ausschließlich Informationen aus dem gegebenen Kontext."
-    )
+    stream = stream_chat(MODEL_NAME, rag["messages"], label="rag", keep_alive=KEEP_ALIVE)
+    print("\n--- Antwort ---\n")
+    answer = print_stream(stream)
+    stream.report()
+    store_answer(rag, answer)
 
+def print_stream(chunks) -> str:
+    """Gibt gestreamte Textstücke zeilenweise auf Terminalbreite umgebrochen aus,
+    sobald eine Zeile vollständig ist. Liefert den gesamten Text zurück."""
     term_width = shutil.get_terminal_size((100, 20)).columns
     buf = ""
-    print("\n--- Antwort ---\n")
-
-    for chunk in ollama.chat(
-        model=MODEL_NAME,
-        messages=[
-            {"role": "system", "content": system_content},
-            {"role": "user", "content": prompt}
-        ],
-        stream=True
-    ):
-        buf += chunk["message"]["content"]
+    parts = []
+    for text in chunks:
+        parts.append(text)
+        buf += text
         if len(buf) > 400 or "\n" in buf:
-            parts = buf.split("\n")
-            for line in parts[:-1]:
+            lines = buf.split("\n")
+            for line in lines[:-1]:
                 print(textwrap.fill(line, width=term_width))
-            buf = parts[-1]
+            buf = lines[-1]
 
     if buf:
         print(textwrap.fill(buf, width=term_width))
+    return "".join(parts)
+
+def print_wrapped(text: str):
+    """Gibt Text zeilenweise auf Terminalbreite umgebrochen aus."""
+    term_width = shutil.get_terminal_size((100, 20)).columns
+    for line in text.split("\n"):
+        print(textwrap.fill(line, width=term_width))
 
 if __name__ == "__main__":
     print("Standard Rag oderr Tool-Use mit: repo, github, commit, issue, fork, sterne, pull request")
+    if WARMUP_ENABLED:
+        warm_up(MODEL_NAME, ANSWER_SYSTEM_PROMPT, EMBED_MODEL, keep_alive=KEEP_ALIVE)
     print("Erstelle bzw. lade Datenbank...")
-    index_files()
+    ready = time.perf_counter()
+    with metrics.span("index_files"):
+        index_files()
+    done = time.perf_counter()
+    print(f"Startzeit: {(done - _START) * 1000:.0f} ms "
+          f"(Import {(ready - _START) * 1000:.0f} ms, Indexabgleich {(done - ready) * 1000:.0f} ms)")
     #show_chunks()
+    if WATCH_ENABLED:
+        start_watcher()
 
     while True:
         frage = input(f"\n[{current_mode.upper()}] Frage('help' für Hilfe): ")
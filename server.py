@@ -0,0 +1,314 @@
+# ================================
+# HTTP/JSON-Server für mehrere gleichzeitige Nutzer
+#
+# Hält Chroma-Collection, Tool-Registry und Modelle warm und beantwortet
+# rag-, tool- und auto-Anfragen nebenläufig. Blockierende Stufen (Embedding,
+# Chroma, BM25, GitHub, Ollama-Stream) laufen in einem Thread-Pool, die
+# Antwort geht als NDJSON-Stream raus (wie bei der Ollama-API). Fragen, die
+# gleichzeitig eintreffen, bettet der QueryBatcher in einem Request ein.
+#
+#   python server.py --port 8080
+#   curl -N localhost:8080/api/ask -d '{"question": "Was macht index_files?", "mode": "rag"}'
+#
+# Endpunkte:
+#   POST /api/ask     {"question": "...", "mode": "rag|tool|auto", "stream": true}
+#   GET  /api/status  Cache-, Router-, Batcher- und Generierungsstatistik
+#   GET  /metrics     Stufen-Statistik im Prometheus-Textformat
+#   GET  /health
+# ================================
+
+import argparse
+import asyncio
+import contextvars
+import json
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+import request
+from chat_client import stream_chat, warm_up
+from embeddings import QueryBatcher, set_query_batcher, EMBED_MODEL, EmbeddingError
+from vector_store import IndexConfigError
+
+SERVER_HOST = "127.0.0.1"
+SERVER_PORT = 8080
+SERVER_WORKERS = 32             # Threads für gleichzeitig laufende Anfragen
+MAX_BODY_BYTES = 1_000_000      # Größte akzeptierte Anfrage
+MODES = ("rag", "tool", "auto")
+
+_STATUS_TEXT = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+                413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+# ------------------------------
+# ANTWORTEN ALS EREIGNISSE
+# ------------------------------
+def _stream_answer(stream, rag_result=None):
+    """Reicht die Tokens eines ChatStream weiter und schließt mit den Messwerten ab."""
+    parts = []
+    for text in stream:
+        if text:
+            parts.append(text)
+            yield {"typ": "token", "text": text}
+    answer = "".join(parts)
+    if rag_result is not None:
+        request.store_answer(rag_result, answer)
+    yield {"typ": "ende", "antwort": answer, "cache": False,
+           "ttft_ms": round(stream.ttft * 1000, 1) if stream.ttft is not None else None,
+           "tokens": stream.eval_count, "tokens_pro_s": round(stream.tokens_per_second, 1)}
+
+
+def answer_events(question: str, mode: str):
+    """Beantwortet eine Frage als Folge von Ereignissen (dicts mit "typ").
+
+    Gleiche Schritte wie ask_rag/ask_with_tools in request.py, nur ohne
+    Konsolenausgabe: modus, quellen bzw. tool, token…, ende – oder fehler."""
+    if mode == "auto":
+        mode = request.choose_mode(question)
+    yield {"typ": "modus", "modus": mode}
+
+    if mode == "tool":
+        choice = request.select_tool(question)
+        if choice["action"] is None:
+            yield {"typ": "ende", "antwort": choice["text"], "cache": False}
+            return
+        result_text, messages = request.tool_messages(choice["action"], choice["args"], question)
+        yield {"typ": "tool", "action": choice["action"], "args": choice["args"],
+               "quelle": choice["quelle"], "ergebnis": result_text}
+        stream = stream_chat(request.MODEL_NAME, messages, label="tool", keep_alive=request.KEEP_ALIVE)
+        yield from _stream_answer(stream)
+        return
+
+    try:
+        result = request.prepare_rag(question)
+    except EmbeddingError as e:
+        yield {"typ": "fehler", "fehler": f"Frage konnte nicht eingebettet werden: {e}"}
+        return
+    if result is None:
+        yield {"typ": "ende", "antwort": "Keine passenden Informationen gefunden.", "cache": False}
+        return
+
+    yield {"typ": "quellen", "kontext": result["stats"],
+           "quellen": [{"quelle": b.label, "dateien": b.paths, "chunks": b.chunk_ids}
+                       for b in result["blocks"]]}
+    if result["cached"] is not None:
+        yield {"typ": "ende", "antwort": result["cached"], "cache": True}
+        return
+    stream = stream_chat(request.MODEL_NAME, result["messages"], label="rag", keep_alive=request.KEEP_ALIVE)
+    yield from _stream_answer(stream, result)
+
+
+async def _events_in_thread(question: str, mode: str):
+    """Lässt answer_events in einem Worker-Thread laufen und liefert die Ereignisse asynchron.
+
+    Bricht der Client ab, stoppt der Thread beim nächsten Ereignis."""
+    loop = asyncio.get_running_loop()
+    events = asyncio.Queue()
+    cancelled = threading.Event()
+    done = object()
+
+    def run():
+        gen = answer_events(question, mode)
+        try:
+            # Eigener Span pro Anfrage → eigene trace_id (siehe stats-Befehl)
+            with metrics.span(f"anfrage.{mode}"):
+                for event in gen:
+                    loop.call_soon_threadsafe(events.put_nowait, event)
+                    if cancelled.is_set():
+                        break
+        except Exception as e:
+            loop.call_soon_threadsafe(events.put_nowait, {"typ": "fehler", "fehler": f"{type(e).__name__}: {e}"})
+        finally:
+            gen.close()
+            loop.call_soon_threadsafe(events.put_nowait, done)
+
+    # Kopierter Kontext: Spans der Anfrage hängen nicht an fremden Eltern-Spans
+    future = loop.run_in_executor(None, contextvars.copy_context().run, run)
+    try:
+        while True:
+            event = await events.get()
+            if event is done:
+                break
+            yield event
+    finally:
+        cancelled.set()
+        await future
+
+
+# ------------------------------
+# HTTP
+# ------------------------------
+async def _read_request(reader):
+    """Liest eine HTTP/1.1-Anfrage. Liefert (methode, pfad, header, body) oder None bei Verbindungsende."""
+    line = await reader.readline()
+    if not line.strip():
+        return None
+    parts = line.decode("latin-1").split()
+    if len(parts) != 3:
+        raise ValueError("Ungültige Anfragezeile")
+    method, path, _ = parts
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    length = int(headers.get("content-length") or 0)
+    if length > MAX_BODY_BYTES:
+        return method, path, headers, None
+    body = await reader.readexactly(length) if length else b""
+    return method, path.split("?", 1)[0], headers, body
+
+
+def _head(status: int, content_type: str, keep_alive: bool, length: int = None) -> bytes:
+    lines = [f"HTTP/1.1 {status} {_STATUS_TEXT.get(status, '')}", f"Content-Type: {content_type}",
+             "Connection: " + ("keep-alive" if keep_alive else "close")]
+    lines.append(f"Content-Length: {length}" if length is not None else "Transfer-Encoding: chunked")
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+
+async def _send(writer, status: int, body, keep_alive: bool, content_type="application/json; charset=utf-8"):
+    if not isinstance(body, (bytes, str)):
+        body = json.dumps(body, ensure_ascii=False)
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+    writer.write(_head(status, content_type, keep_alive, len(body)) + body)
+    await writer.drain()
+
+
+async def _send_events(writer, events, keep_alive: bool):
+    """Schickt Ereignisse als NDJSON, ein Chunk pro Zeile, sobald sie entstehen."""
+    writer.write(_head(200, "application/x-ndjson; charset=utf-8", keep_alive))
+    async for event in events:
+        line = (json.dumps(event, ensure_ascii=False) + "\n").encode("utf-8")
+        writer.write(f"{len(line):X}\r\n".encode() + line + b"\r\n")
+        await writer.drain()
+    writer.write(b"0\r\n\r\n")
+    await writer.drain()
+
+
+async def _ask(writer, body: bytes, keep_alive: bool):
+    try:
+        payload = json.loads(body or b"{}")
+    except ValueError:
+        return await _send(writer, 400, {"fehler": "Body ist kein gültiges JSON"}, keep_alive)
+    question = payload.get("question") if isinstance(payload, dict) else None
+    mode = payload.get("mode", "auto") if isinstance(payload, dict) else None
+    if not isinstance(question, str) or not question.strip():
+        return await _send(writer, 400, {"fehler": "'question' fehlt"}, keep_alive)
+    if mode not in MODES:
+        return await _send(writer, 400, {"fehler": f"'mode' muss eines von {', '.join(MODES)} sein"}, keep_alive)
+
+    events = _events_in_thread(question.strip(), mode)
+    try:
+        if payload.get("stream", True):
+            return await _send_events(writer, events, keep_alive)
+
+        # Ohne Streaming: alle Ereignisse zu einer Antwort zusammenfassen
+        result, status = {}, 200
+        async for event in events:
+            kind = event.pop("typ")
+            if kind == "token":
+                continue
+            if kind == "fehler":
+                status = 500
+            result.update(event)
+        await _send(writer, status, result, keep_alive)
+    finally:
+        # Bricht der Client ab, den Worker-Thread sofort stoppen statt erst beim Aufräumen
+        await events.aclose()
+
+
+async def handle_connection(reader, writer):
+    """Bedient eine Verbindung; mit Keep-Alive auch mehrere Anfragen nacheinander."""
+    try:
+        while True:
+            try:
+                req = await _read_request(reader)
+            except ValueError as e:
+                await _send(writer, 400, {"fehler": str(e)}, False)
+                break
+            if req is None:
+                break
+            method, path, headers, body = req
+            keep_alive = headers.get("connection", "").lower() != "close"
+            started = time.perf_counter()
+
+            if body is None:
+                await _send(writer, 413, {"fehler": f"Anfrage größer als {MAX_BODY_BYTES} Bytes"}, False)
+                break
+            if path == "/api/ask":
+                if method != "POST":
+                    await _send(writer, 405, {"fehler": "Nur POST"}, keep_alive)
+                else:
+                    await _ask(writer, body, keep_alive)
+            elif path == "/api/status" and method == "GET":
+                await _send(writer, 200, request.status_info(), keep_alive)
+            elif path == "/metrics" and method == "GET":
+                await _send(writer, 200, metrics.prometheus_text(), keep_alive, "text/plain; version=0.0.4")
+            elif path == "/health" and method == "GET":
+                await _send(writer, 200, {"status": "ok"}, keep_alive)
+            else:
+                await _send(writer, 404, {"fehler": f"Unbekannter Pfad: {method} {path}"}, keep_alive)
+            metrics.record("http", time.perf_counter() - started)
+            if not keep_alive:
+                break
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass    # Client hat die Verbindung geschlossen
+    finally:
+        writer.close()
+
+
+async def start_server(host: str = SERVER_HOST, port: int = SERVER_PORT, workers: int = SERVER_WORKERS):
+    """Startet den Server auf der laufenden Event-Loop und liefert das asyncio.Server-Objekt."""
+    loop = asyncio.get_running_loop()
+    loop.set_default_executor(ThreadPoolExecutor(max_workers=workers, thread_name_prefix="anfrage"))
+    return await asyncio.start_server(handle_connection, host, port)
+
+
+async def serve(host: str, port: int, workers: int = SERVER_WORKERS):
+    server = await start_server(host, port, workers)
+    addresses = ", ".join(f"http://{s.getsockname()[0]}:{s.getsockname()[1]}" for s in server.sockets)
+    print(f"Server läuft auf {addresses} (Strg+C zum Beenden)")
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="RAG- und Tool-Anfragen als HTTP/JSON-Server.")
+    parser.add_argument("--host", default=SERVER_HOST)
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    parser.add_argument("--workers", type=int, default=SERVER_WORKERS, help="Gleichzeitig bearbeitete Anfragen")
+    parser.add_argument("--no-index", action="store_true", help="Ordner beim Start nicht abgleichen")
+    parser.add_argument("--watch", action="store_true", default=request.WATCH_ENABLED,
+                        help="Geänderte Dateien im Hintergrund nachindexieren")
+    args = parser.parse_args()
+
+    if request.WARMUP_ENABLED:
+        warm_up(request.MODEL_NAME, request.ANSWER_SYSTEM_PROMPT, EMBED_MODEL, keep_alive=request.KEEP_ALIVE)
+    if not args.no_index:
+        print("Erstelle bzw. lade Datenbank...")
+        with metrics.span("index_files"):
+            request.index_files()
+    try:
+        request.get_collection()
+    except IndexConfigError as e:
+        # Ohne passenden Index würden Anfragen nur falsche Treffer liefern
+        print(f"Index passt nicht zur Konfiguration: {e}")
+        sys.exit(1)
+    set_query_batcher(QueryBatcher())
+    if args.watch:
+        request.start_watcher(catch_up=args.no_index)
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers))
+    except KeyboardInterrupt:
+        print("Server beendet.")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,11 +4,12 @@ import inspect
 TOOLS = {
     "list_user_repos": {
         "function": list_user_repos,
-        "description": "Listet alle Repositories eines Benutzers mit Basisstatistiken (Sprache, Sterne, Forks, letzte Aktualisierung)."
+        "description": "Listet die zuletzt aktualisierten Repositories eines Benutzers (max. limit) mit Basisstatistiken (Sprache, Sterne, Forks, letzte Aktualisierung)."
     },
     "get_repo_stats": {
         "function": get_repo_stats,
-        "description": "Liefert Sterne, Forks, Issues und Sprache eines GitHub-Repositories."
+        "description": "Liefert Statistiken eines GitHub-Repositories: Sterne, Forks, Issues und Sprache.",
+        "counts": True      # beantwortet "Wie viele Sterne/Forks/Issues ..." (siehe tool_router.py)
     },
     "get_last_commit": {
         "function": get_last_commit,
@@ -33,5 +34,3 @@ def generate_tool_descriptions(tools_dict):
 
 def format_output(data):
     return format_result(data)
-
-print(generate_tool_descriptions(TOOLS))
\ No newline at end of file
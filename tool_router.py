@@ -0,0 +1,157 @@
+# ================================
+# Schneller Tool-Router ohne LLM-Auswahlrunde
+#
+# Wählt ein Tool deterministisch anhand der Beschreibungen aus dem
+# TOOLS-Registry und zieht Argumente wie username/repo_name per Regex aus
+# der Frage. Nur wenn die Zuordnung nicht eindeutig ist, Pflichtargumente
+# fehlen oder mehrdeutig sind oder die Frage nach einer Anzahl bzw. Liste
+# fragt, die das gewählte Tool nicht liefert, wird wie bisher das Modell gefragt.
+# ================================
+
+import inspect
+import math
+import re
+import threading
+
+_WORD_RE = re.compile(r"[a-zäöüß]+")
+_STOPWORDS = {
+    "der", "die", "das", "den", "dem", "des", "ein", "eine", "einer", "eines", "einem",
+    "und", "oder", "mit", "von", "für", "auf", "aus", "bei", "zum", "zur", "ist", "sind",
+    "hat", "haben", "wie", "was", "welche", "welcher", "viele", "mir", "mich", "mein",
+    "meine", "meinem", "meinen", "zeig", "zeige", "gib", "nach", "max", "alle", "inkl",
+    "zurück", "liefert", "listet", "gibt", "bitte", "the", "of", "get", "list",
+}
+# GitHub-URLs werden auf "owner/repo" gekürzt, andere URLs ganz entfernt,
+# damit der Host (github.com) nicht als Benutzername erkannt wird
+_GITHUB_URL_RE = re.compile(r"(?:\b[a-z][a-z0-9+.-]*://)?(?:www\.)?github\.com/([\w-]+/[\w.-]+)\S*", re.I)
+_URL_RE = re.compile(r"\b[a-z][a-z0-9+.-]*://\S+", re.I)
+# owner/repo als eigenständiges Wort: Benutzernamen ohne Punkte, kein weiteres
+# Pfadsegment davor oder danach (sonst wäre es eher ein Dateipfad)
+_OWNER_REPO_RE = re.compile(r"(?<![\w./@:-])([A-Za-z0-9](?:[A-Za-z0-9-]*[A-Za-z0-9])?)/([\w.-]+)(?![\w/-])")
+_COUNT_RE = re.compile(r"\b(?:wie\s*viele|anzahl|how\s+many|count)\b", re.I)
+_LIST_RE = re.compile(r"\b(?:list\w*|auflisten|alle)\b", re.I)
+_REPO_KEYWORDS = ("repo", "repository", "repositorys", "repositories", "projekt")
+_USER_KEYWORDS = ("user", "benutzer", "nutzer", "account", "owner", "von")
+# Der Wert steht im Lookahead, damit "von user octocat" auch "user octocat" findet
+_REPO_RE = re.compile(r"\b(?:%s)\s+[\"'`]?(?=([\w.-]+))" % "|".join(_REPO_KEYWORDS), re.I)
+_USER_RE = re.compile(r"\b(?:%s)\s+[\"'`]?@?(?=([\w.-]+))" % "|".join(_USER_KEYWORDS), re.I)
+_LIMIT_RE = re.compile(r"\b(?:top\s+)?(\d{1,3})\s+(?:repos|repositories|repositorys|projekte)\b", re.I)
+
+
+def _first_value(pattern, text: str):
+    """Erster Treffer, der kein Füllwort oder selbst ein Schlüsselwort ist."""
+    for match in pattern.finditer(text):
+        value = match.group(1)
+        if value.lower() not in _STOPWORDS and value.lower() not in _REPO_KEYWORDS + _USER_KEYWORDS:
+            return value
+    return None
+
+
+def _strip_urls(text: str) -> str:
+    return _URL_RE.sub(" ", _GITHUB_URL_RE.sub(r"\1", text))
+
+
+def _stem(word: str) -> str:
+    """Grobes Stemming: die ersten 4 Buchstaben genügen für 'commits'/'commit', 'repo'/'repos'."""
+    return word[:4]
+
+
+def _terms(text: str):
+    return {_stem(w) for w in _WORD_RE.findall(text.lower()) if len(w) > 2 and w not in _STOPWORDS}
+
+
+class ToolRouter:
+    """Ordnet Fragen ohne LLM einem Tool zu, wenn die Zuordnung eindeutig ist."""
+
+    def __init__(self, tools: dict, min_score: float = 1.0, min_margin: float = 1.3):
+        self.tools = tools
+        self.min_score = min_score
+        self.min_margin = min_margin
+        self.counts = {"schnell": 0, "llm": 0}
+        self._lock = threading.Lock()
+
+        # Einmalig vorberechnet: Begriffe pro Tool aus Name + Beschreibung,
+        # gewichtet nach Seltenheit über alle Tools (IDF)
+        self._terms = {}
+        self._params = {}
+        self._lists = set()      # Tools, die eine Liste liefern
+        self._counts = set()     # Tools, die Kennzahlen (Sterne, Forks, ...) liefern ("counts" in TOOLS)
+        for name, data in tools.items():
+            description = data.get("description", "")
+            words = name.replace("_", " ") + " " + description
+            self._terms[name] = _terms(words)
+            if name.startswith("list_") or "listet" in description.lower():
+                self._lists.add(name)
+            if data.get("counts"):
+                self._counts.add(name)
+            sig = inspect.signature(data["function"])
+            self._params[name] = {
+                p: v.default is inspect.Parameter.empty for p, v in sig.parameters.items()
+            }
+        df = {}
+        for terms in self._terms.values():
+            for t in terms:
+                df[t] = df.get(t, 0) + 1
+        self._weights = {t: math.log(1 + len(tools) / n) for t, n in df.items()}
+
+    def extract_arguments(self, question: str) -> dict:
+        """Zieht username, repo_name und limit aus der Frage."""
+        return self._extract(question)[0]
+
+    def _extract(self, question: str):
+        """Liefert (Argumente, mehrdeutig). Mehrdeutig heißt: mehrere verschiedene
+        owner/repo-Angaben oder ein Benutzer, der nicht zum owner/repo passt."""
+        question = _strip_urls(question)
+        args, ambiguous = {}, False
+        pairs = {(m.group(1), m.group(2).rstrip(".").removesuffix(".git"))
+                 for m in _OWNER_REPO_RE.finditer(question)}
+        user = _first_value(_USER_RE, question)
+        if pairs:
+            (args["username"], args["repo_name"]), *others = sorted(pairs)
+            ambiguous = bool(others) or (user is not None and user.lower() != args["username"].lower())
+        else:
+            repo = _first_value(_REPO_RE, question)
+            if repo:
+                args["repo_name"] = repo
+            if user:
+                args["username"] = user
+        limit = _LIMIT_RE.search(question)
+        if limit:
+            args["limit"] = int(limit.group(1))
+        return args, ambiguous
+
+    def _score(self, name: str, terms, args) -> float:
+        score = sum(self._weights[t] for t in terms & self._terms[name])
+        # Passende Argumente (z. B. ein Repo-Name) sprechen für Tools, die sie nutzen
+        score += sum(1 for a in args if a in self._params[name])
+        return score
+
+    def route(self, question: str):
+        """Liefert (tool_name, arguments) bei eindeutiger Zuordnung, sonst None."""
+        terms = _terms(_strip_urls(question))
+        args, ambiguous = self._extract(question)
+
+        ranked = sorted(((self._score(name, terms, args), name) for name in self.tools), reverse=True)
+        best_score, best = ranked[0]
+        second_score = ranked[1][0] if len(ranked) > 1 else 0.0
+
+        confident = best_score >= self.min_score and best_score >= self.min_margin * second_score
+        # "Wie viele Commits ..." beantwortet get_last_commit nicht, auch wenn das Tool passt
+        if (ambiguous or (_COUNT_RE.search(question) and best not in self._counts)
+                or (_LIST_RE.search(question) and best not in self._lists)):
+            confident = False
+        params = self._params[best]
+        required_ok = all(p in args for p, required in params.items() if required)
+
+        with self._lock:
+            if confident and required_ok:
+                self.counts["schnell"] += 1
+                return best, {k: v for k, v in args.items() if k in params}
+            self.counts["llm"] += 1
+            return None
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.counts["schnell"] + self.counts["llm"]
+            return {**self.counts,
+                    "anteil_schnell": round(self.counts["schnell"] / total, 3) if total else 0.0}
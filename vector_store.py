@@ -0,0 +1,442 @@
+# ================================
+# Vektorspeicher-Backends
+#
+# request.py spricht nur die Schnittstelle VectorStore an (add, get, query,
+# delete, count – Argumente und Rückgaben wie bei einer Chroma-Collection):
+#   ChromaStore:  Adapter für eine Chroma-Collection (Standard)
+#   NumpyStore:   flacher Index in einer memory-mapped NumPy-Datei, optional
+#                 als float16 oder int8 (mit Nachbewertung in float32);
+#                 Dokumente und Metadaten liegen in einer SQLite-Tabelle.
+# Für die Korpusgrößen hier reicht eine exakte Suche über alle Vektoren: kein
+# Index-Aufbau beim Start und nur ein Bruchteil des Speichers.
+# Embedding-Modell und -Dimension stehen in den Metadaten des Speichers;
+# check_config() verhindert, dass Vektoren verschiedener Modelle oder
+# Längen gemischt bzw. miteinander verglichen werden.
+# ================================
+
+import json
+import sqlite3
+from abc import ABC, abstractmethod
+import threading
+from pathlib import Path
+
+np = None               # NumPy lädt erst NumpyStore – Starts mit Chroma brauchen es nicht
+
+BLOCK_ROWS = 8192       # Vektoren pro Block bei der Suche (float32: ohne Kopie direkt aus der Datei)
+CAST_BLOCK_ROWS = 1024  # float16/int8: kleinere Blöcke, damit die float32-Kopie im CPU-Cache bleibt
+RESCORE_FACTOR = 4      # int8: so viele Kandidaten pro Treffer werden in float32 nachbewertet
+INCLUDE_DEFAULT = ("documents", "metadatas")
+
+
+class IndexConfigError(RuntimeError):
+    """Der Speicher wurde mit einem anderen Embedding-Modell oder einer anderen Dimension angelegt."""
+
+
+class VectorStore(ABC):
+    """Schnittstelle der Vektorspeicher; ein Backend ohne alle Methoden lässt sich nicht anlegen.
+
+    get liefert {"ids": [...], "documents": [...], "metadatas": [...]}, query
+    dieselben Schlüssel plus "distances" als eine Liste pro Anfrage-Vektor.
+    include wählt wie bei Chroma, welche Felder außer den IDs geladen werden."""
+
+    name = "local_knowledge"
+
+    @property
+    @abstractmethod
+    def metadata(self) -> dict:
+        """Metadaten des Speichers (u. a. embedding_model und embedding_dim)."""
+
+    @abstractmethod
+    def add(self, ids, embeddings, documents=None, metadatas=None):
+        ...
+
+    @abstractmethod
+    def get(self, ids=None, include=INCLUDE_DEFAULT, limit=None, offset=None) -> dict:
+        ...
+
+    @abstractmethod
+    def query(self, query_embeddings, n_results=10, include=INCLUDE_DEFAULT) -> dict:
+        ...
+
+    @abstractmethod
+    def delete(self, ids):
+        ...
+
+    @abstractmethod
+    def count(self) -> int:
+        ...
+
+    @abstractmethod
+    def set_metadata(self, **values):
+        ...
+
+    @abstractmethod
+    def clear(self):
+        """Entfernt alle Chunks; danach darf sich auch die Dimension ändern."""
+
+    def check_config(self, model: str, dim: int):
+        """Prüft, ob der Speicher mit model und dim angelegt wurde.
+
+        Ein leerer Speicher übernimmt die Konfiguration, sonst wird bei einer
+        Abweichung IndexConfigError geworfen – Anfragen mit anders erzeugten
+        Vektoren würden keine Fehlermeldung, sondern falsche Treffer liefern."""
+        meta = self.metadata
+        stored = (meta.get("embedding_model"), str(meta.get("embedding_dim")))
+        if stored == (model, str(dim)):
+            return
+        if self.count() == 0:
+            self.clear()
+            self.set_metadata(embedding_model=model, embedding_dim=dim)
+            return
+        raise IndexConfigError(f"Index enthält Embeddings von {stored[0]} mit {stored[1]} Dimensionen, "
+                               f"konfiguriert sind {model} mit {dim} – bitte neu indexieren")
+
+
+class ChromaStore(VectorStore):
+    """Reicht alle Aufrufe an eine Chroma-Collection weiter."""
+
+    def __init__(self, client, name: str = "local_knowledge", metadata: dict = None):
+        self.client = client
+        self.name = name
+        self._create_metadata = metadata
+        self.collection = client.get_or_create_collection(name, metadata=metadata)
+
+    @property
+    def metadata(self) -> dict:
+        return self.collection.metadata or {}
+
+    def set_metadata(self, **values):
+        # Die Distanzfunktion (hnsw:*) lässt sich nachträglich nicht ändern
+        meta = {k: v for k, v in self.metadata.items() if not k.startswith("hnsw:")}
+        meta.update(values)
+        self.collection.modify(metadata=meta)
+
+    def clear(self):
+        # Chroma legt die Dimension beim ersten add fest → Collection neu anlegen
+        self.client.delete_collection(self.name)
+        self.collection = self.client.get_or_create_collection(self.name, metadata=self._create_metadata)
+
+    def add(self, ids, embeddings, documents=None, metadatas=None):
+        self.collection.add(ids=ids, embeddings=embeddings, documents=documents, metadatas=metadatas)
+
+    def get(self, ids=None, include=INCLUDE_DEFAULT, limit=None, offset=None) -> dict:
+        return self.collection.get(ids=ids, include=list(include), limit=limit, offset=offset)
+
+    def query(self, query_embeddings, n_results=10, include=INCLUDE_DEFAULT) -> dict:
+        return self.collection.query(query_embeddings=query_embeddings, n_results=n_results,
+                                     include=list(include))
+
+    def delete(self, ids):
+        self.collection.delete(ids=ids)
+
+    def count(self) -> int:
+        return self.collection.count()
+
+
+class NumpyStore(VectorStore):
+    """Exakte Kosinus-Suche über eine memory-mapped Vektordatei.
+
+    dtype bestimmt das Speicherformat: float32 (schnellste Suche), float16
+    (halber Speicher) oder int8 (ein Viertel, pro Vektor skaliert). float16 und
+    int8 werden blockweise nach float32 umgewandelt; das kostet Rechenzeit,
+    spart aber RAM und Plattenplatz. Bei int8 mit rescore=True liegt
+    zusätzlich eine float32-Kopie auf der Platte, mit der die besten Kandidaten
+    nachbewertet werden; sie wird nur für diese Zeilen gelesen. Gelöschte
+    Zeilen werden beim nächsten add wiederverwendet. Das Format wird beim
+    Anlegen festgelegt; ein bestehender Speicher behält sein dtype.
+    Zugriffe sind wie bei den SQLite-Speichern über ein Lock serialisiert."""
+
+    DTYPES = ("float32", "float16", "int8")
+
+    def __init__(self, path, dtype: str = "float32", rescore: bool = True, block_rows: int = None,
+                 name: str = "local_knowledge"):
+        global np
+        if np is None:
+            try:
+                import numpy as np
+            except ImportError:
+                raise ImportError("Das numpy-Backend benötigt NumPy (pip install numpy).") from None
+        if dtype not in self.DTYPES:
+            raise ValueError(f"Unbekanntes dtype {dtype!r}, erlaubt: {', '.join(self.DTYPES)}")
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.name = name
+        self._lock = threading.RLock()
+        self.conn = sqlite3.connect(str(self.path / "chunks.sqlite"), check_same_thread=False)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS chunks (
+                row      INTEGER PRIMARY KEY,
+                id       TEXT NOT NULL UNIQUE,
+                document TEXT,
+                metadata TEXT
+            )
+        """)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS info (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self.conn.commit()
+
+        info = dict(self.conn.execute("SELECT key, value FROM info"))
+        self.dtype = info.get("dtype", dtype)
+        self.rescore = info.get("rescore", "1" if rescore else "0") == "1"
+        self.dim = int(info["dim"]) if "dim" in info else None
+        if "dtype" not in info:
+            self._set_info(dtype=self.dtype, rescore="1" if self.rescore else "0")
+        self.block_rows = block_rows or (BLOCK_ROWS if self.dtype == "float32" else CAST_BLOCK_ROWS)
+
+        # Zeilenzuordnung im Speicher; Vektoren bleiben auf der Platte
+        self._ids = dict(self.conn.execute("SELECT id, row FROM chunks"))
+        self._size = max(self._ids.values(), default=-1) + 1
+        self._row_ids = [None] * self._size
+        for cid, row in self._ids.items():
+            self._row_ids[row] = cid
+        self._free = [row for row in range(self._size - 1, -1, -1) if self._row_ids[row] is None]
+        self._capacity = 0
+        self._vectors = self._scales = self._full = None
+        self._valid = np.zeros(0, dtype=bool)
+        if self.dim is not None:
+            self._open_files()
+
+    # -- Dateien -------------------------------------------------------
+    def _files(self):
+        """(Dateiname, dtype, Werte pro Zeile) der Vektordateien dieses Formats."""
+        files = [("vectors.bin", self.dtype, self.dim)]
+        if self.dtype == "int8":
+            files.append(("scales.bin", "float32", 1))
+            if self.rescore:
+                files.append(("full.bin", "float32", self.dim))
+        return files
+
+    def _open_files(self, capacity: int = None):
+        """Mappt die Vektordateien; mit capacity werden sie vorher auf diese Zeilenzahl vergrößert."""
+        maps = []
+        for filename, dtype, width in self._files():
+            file = self.path / filename
+            row_bytes = np.dtype(dtype).itemsize * width
+            if capacity is not None:
+                with open(file, "ab") as f:
+                    f.truncate(capacity * row_bytes)
+            rows = file.stat().st_size // row_bytes if file.exists() else 0
+            maps.append(np.memmap(file, dtype=dtype, mode="r+", shape=(rows, width)) if rows else None)
+            self._capacity = rows
+        self._vectors = maps[0]
+        self._scales = maps[1][:, 0] if len(maps) > 1 and maps[1] is not None else None
+        self._full = maps[2] if len(maps) > 2 else None
+        valid = np.zeros(self._capacity, dtype=bool)
+        valid[:self._size] = [cid is not None for cid in self._row_ids]
+        self._valid = valid
+
+    def _grow(self, rows: int):
+        if rows <= self._capacity:
+            return
+        self._flush()
+        # Mappings vor dem Vergrößern freigeben (unter Windows sonst nicht möglich)
+        self._vectors = self._scales = self._full = None
+        self._open_files(max(rows, self._capacity * 2, 1024))
+
+    def _flush(self):
+        for m in (self._vectors, self._scales, self._full):
+            if m is not None:
+                m.flush()
+
+    def _read_full(self, rows):
+        """Liest float32-Zeilen für die Nachbewertung per Dateizugriff statt über das
+        Mapping – so belegen nur diese Zeilen Arbeitsspeicher, nicht ganze Seitenbereiche."""
+        row_bytes = 4 * self.dim
+        out = np.empty((len(rows), self.dim), dtype=np.float32)
+        with open(self.path / "full.bin", "rb", buffering=0) as f:
+            for i, row in enumerate(rows):
+                f.seek(int(row) * row_bytes)
+                out[i] = np.frombuffer(f.read(row_bytes), dtype=np.float32)
+        return out
+
+    def _set_info(self, **values):
+        self.conn.executemany("INSERT OR REPLACE INTO info (key, value) VALUES (?, ?)",
+                              [(k, str(v)) for k, v in values.items()])
+
+    @property
+    def metadata(self) -> dict:
+        with self._lock:
+            info = dict(self.conn.execute("SELECT key, value FROM info"))
+        info["backend"] = "numpy"
+        return info
+
+    def set_metadata(self, **values):
+        with self._lock:
+            self._set_info(**values)
+            self.conn.commit()
+
+    def clear(self):
+        with self._lock:
+            files = self._files() if self.dim is not None else []
+            self._vectors = self._scales = self._full = None
+            for filename, _, _ in files:
+                (self.path / filename).unlink(missing_ok=True)
+            self.conn.execute("DELETE FROM chunks")
+            self.conn.execute("DELETE FROM info WHERE key = 'dim'")
+            self.conn.commit()
+            self.dim = None
+            self._ids, self._row_ids, self._free = {}, [], []
+            self._size = self._capacity = 0
+            self._valid = np.zeros(0, dtype=bool)
+
+    # -- Schreiben -----------------------------------------------------
+    def add(self, ids, embeddings, documents=None, metadatas=None):
+        """Fügt Chunks hinzu; bereits vorhandene IDs werden ersetzt."""
+        ids = list(ids)
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        if vectors.ndim != 2 or len(vectors) != len(ids):
+            raise ValueError(f"{len(ids)} IDs, aber Embeddings der Form {vectors.shape}")
+        if not ids:
+            return
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        documents = documents or [None] * len(ids)
+        metadatas = metadatas or [None] * len(ids)
+
+        with self._lock:
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+                self._set_info(dim=self.dim)
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(f"Embedding-Dimension {vectors.shape[1]} passt nicht zum Speicher ({self.dim})")
+
+            rows = []
+            for cid in ids:
+                if cid in self._ids:
+                    row = self._ids[cid]
+                elif self._free:
+                    row = self._free.pop()
+                else:
+                    row = self._size
+                    self._size += 1
+                    self._row_ids.append(None)
+                self._ids[cid] = row
+                self._row_ids[row] = cid
+                rows.append(row)
+            self._grow(self._size)
+
+            rows_arr = np.asarray(rows)
+            if self.dtype == "int8":
+                scales = np.maximum(np.abs(vectors).max(axis=1), 1e-12) / 127
+                self._vectors[rows_arr] = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+                self._scales[rows_arr] = scales
+                if self._full is not None:
+                    self._full[rows_arr] = vectors
+            else:
+                self._vectors[rows_arr] = vectors.astype(self.dtype)
+            self._valid[rows_arr] = True
+            self._flush()
+
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO chunks (row, id, document, metadata) VALUES (?, ?, ?, ?)",
+                [(row, cid, doc, json.dumps(meta, ensure_ascii=False) if meta is not None else None)
+                 for row, cid, doc, meta in zip(rows, ids, documents, metadatas)])
+            self.conn.commit()
+
+    def delete(self, ids):
+        with self._lock:
+            rows = [self._ids.pop(cid) for cid in dict.fromkeys(ids) if cid in self._ids]
+            if not rows:
+                return
+            for row in rows:
+                self._row_ids[row] = None
+                self._valid[row] = False
+                self._free.append(row)
+            self.conn.executemany("DELETE FROM chunks WHERE row = ?", [(row,) for row in rows])
+            self.conn.commit()
+
+    # -- Lesen ---------------------------------------------------------
+    def count(self) -> int:
+        with self._lock:
+            return len(self._ids)
+
+    def _load(self, ids, include) -> dict:
+        """Holt Dokumente/Metadaten zu IDs aus der SQLite-Tabelle (Reihenfolge wie ids)."""
+        result = {"ids": list(ids)}
+        want_docs, want_metas = "documents" in include, "metadatas" in include
+        if not (want_docs or want_metas):
+            return result
+        rows = {}
+        for start in range(0, len(ids), 500):
+            page = ids[start:start + 500]
+            rows.update((cid, (doc, meta)) for cid, doc, meta in self.conn.execute(
+                f"SELECT id, document, metadata FROM chunks WHERE id IN ({','.join('?' * len(page))})", page))
+        if want_docs:
+            result["documents"] = [rows[cid][0] for cid in ids]
+        if want_metas:
+            result["metadatas"] = [json.loads(rows[cid][1]) if rows[cid][1] else None for cid in ids]
+        return result
+
+    def get(self, ids=None, include=INCLUDE_DEFAULT, limit=None, offset=None) -> dict:
+        with self._lock:
+            if ids is None:
+                selected = [cid for cid in self._row_ids if cid is not None]
+            else:
+                selected = [cid for cid in dict.fromkeys(ids) if cid in self._ids]
+            selected = selected[offset or 0:]
+            if limit is not None:
+                selected = selected[:limit]
+            return self._load(selected, include)
+
+    def query(self, query_embeddings, n_results=10, include=INCLUDE_DEFAULT) -> dict:
+        """Beste n_results Treffer pro Anfrage-Vektor nach Kosinus-Ähnlichkeit.
+
+        Alle Anfragen werden gemeinsam blockweise mit einem Matrixprodukt
+        bewertet; pro Block bleiben nur die jeweils besten Kandidaten übrig."""
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        if queries.ndim == 1:
+            queries = queries[None, :]
+        queries = queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+        keys = ["ids", "distances"] + [k for k in ("documents", "metadatas") if k in include]
+
+        with self._lock:
+            k = min(n_results, len(self._ids))
+            if k == 0 or self.dim is None:
+                return {key: [[] for _ in queries] for key in keys}
+            if queries.shape[1] != self.dim:
+                raise ValueError(f"Anfrage-Dimension {queries.shape[1]} passt nicht zum Speicher ({self.dim})")
+
+            rescore = self.dtype == "int8" and self._full is not None
+            keep = k * RESCORE_FACTOR if rescore else k
+            top_scores = np.empty((len(queries), 0), dtype=np.float32)
+            top_rows = np.empty((len(queries), 0), dtype=np.int64)
+            for start in range(0, self._size, self.block_rows):
+                end = min(start + self.block_rows, self._size)
+                block = np.asarray(self._vectors[start:end], dtype=np.float32)
+                scores = queries @ block.T
+                if self.dtype == "int8":
+                    scores *= self._scales[start:end]
+                scores[:, ~self._valid[start:end]] = -np.inf
+                rows = np.broadcast_to(np.arange(start, end), scores.shape)
+                top_scores, top_rows = _top(np.concatenate([top_scores, scores], axis=1),
+                                            np.concatenate([top_rows, rows], axis=1), keep)
+
+            result = {key: [] for key in keys}
+            for q, scores, rows in zip(queries, top_scores, top_rows):
+                rows = rows[np.isfinite(scores)]
+                if rescore and len(rows):
+                    rows = np.sort(rows)     # aufsteigend → Lesezugriffe in Dateireihenfolge
+                    scores = self._read_full(rows) @ q
+                else:
+                    scores = scores[np.isfinite(scores)]
+                order = np.argsort(-scores)[:k]
+                ids = [self._row_ids[r] for r in rows[order]]
+                loaded = self._load(ids, include)
+                result["ids"].append(ids)
+                result["distances"].append([float(1 - s) for s in scores[order]])
+                for key in ("documents", "metadatas"):
+                    if key in result:
+                        result[key].append(loaded[key])
+            return result
+
+    def close(self):
+        with self._lock:
+            self._flush()
+            self._vectors = self._scales = self._full = None
+            self.conn.close()
+
+
+def _top(scores, rows, k):
+    """Behält pro Zeile die k besten Spalten (unsortiert)."""
+    if scores.shape[1] <= k:
+        return scores, rows
+    part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    return np.take_along_axis(scores, part, axis=1), np.take_along_axis(rows, part, axis=1)